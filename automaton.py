@@ -0,0 +1,354 @@
+import numpy as np
+import sim # local module
+
+# (dY, dX) offset of each cell in the 8-neighborhood: N, NE, E, SE, S, SW, W, NW
+NEIGHBORS = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+STEPS_PER_HOUR = 60 # default minimum number of timesteps per hour
+GROUP_AREA_RATIO = 2 # largest ratio between the window areas of scenarios stepped together
+
+''' returns the (source, destination) slices pairing every cell with its neighbor at offset d
+    along one axis of length n, i.e array[dst] is the neighbor of array[src] '''
+def neighborSlices(d, n):
+    if d > 0:
+        return slice(0, n - d), slice(d, n)
+    if d < 0:
+        return slice(-d, n), slice(0, n + d)
+    return slice(0, n), slice(0, n)
+
+''' returns an array of the fuel property given by method (a FirePoint method name)
+    for every cell of the fuelTypes array; shares the fuel values of sim.FirePoint '''
+def fuelPropertyGrid(fuelTypes, method):
+    grid = np.zeros(fuelTypes.shape, dtype=np.float64)
+    for fuelType in np.unique(fuelTypes):
+        fuel = sim.FirePoint()
+        fuel.fuelType = fuelType
+        grid[fuelTypes == fuelType] = getattr(fuel, method)()
+    return grid
+
+''' copies of the cells that the burning scenarios of an AutomatonSimulator can reach within margin cells,
+    cut out around each scenario's own active cells. all windows share one shape and every fire sits at
+    the same place of its window, so the steps of all scenarios run on one small region of these arrays.
+    the rates of spread are only computed here, for the cells of the windows '''
+class ScenarioWindows:
+    def __init__(self, fireSim, scenarios, margin):
+        self.fireSim = fireSim
+        self.scenarios = scenarios # scenario of every window
+        bounds = fireSim.activeBounds[scenarios]
+        yBoundary, xBoundary = fireSim.yBoundary, fireSim.xBoundary
+        self.height = int((np.minimum(bounds[:, 1] + margin, yBoundary) - np.maximum(bounds[:, 0] - margin, 0)).max())
+        self.width = int((np.minimum(bounds[:, 3] + margin, xBoundary) - np.maximum(bounds[:, 2] - margin, 0)).max())
+        self.yStart = np.clip(bounds[:, 0] - margin, 0, yBoundary - self.height)
+        self.xStart = np.clip(bounds[:, 2] - margin, 0, xBoundary - self.width)
+        # yStart, yEnd, xStart, xEnd of the active cells of every window, None when nothing burns
+        bounds = bounds - np.stack([self.yStart, self.yStart, self.xStart, self.xStart], axis=1)
+        self.activeBounds = (int(bounds[:, 0].min()), int(bounds[:, 1].max()),
+                             int(bounds[:, 2].min()), int(bounds[:, 3].max()))
+
+        shape = (len(self.scenarios), self.height, self.width)
+        self.fireStatus = np.empty(shape, dtype=fireSim.fireStatus.dtype)
+        self.burnFraction = np.empty(shape, dtype=fireSim.burnFraction.dtype)
+        self.burnoutTime = np.empty(shape, dtype=fireSim.burnoutTime.dtype)
+        self.ignitionHour = np.empty(shape, dtype=fireSim.history.ignitionHour.dtype)
+        self.burnoutHour = np.empty(shape, dtype=fireSim.history.burnoutHour.dtype)
+        self.burnTime = np.empty(shape, dtype=fireSim.burnTime.dtype)
+        self.inverseHeatSink = np.empty(shape, dtype=fireSim.inverseHeatSink.dtype)
+        # burn fraction per hour from each cell to its neighbors, before the heat sink of the neighbor
+        self.spreadRates = np.empty((len(NEIGHBORS),) + shape, dtype=np.float32)
+        for i, (scenario, region) in enumerate(zip(self.scenarios, self.regions())):
+            self.fireStatus[i] = fireSim.fireStatus[scenario][region]
+            self.burnFraction[i] = fireSim.burnFraction[scenario][region]
+            self.burnoutTime[i] = fireSim.burnoutTime[scenario][region]
+            self.ignitionHour[i] = fireSim.history.ignitionHour[scenario][region]
+            self.burnoutHour[i] = fireSim.history.burnoutHour[scenario][region]
+            self.burnTime[i] = fireSim.burnTime[region]
+            self.inverseHeatSink[i] = fireSim.inverseHeatSink[scenario if len(fireSim.inverseHeatSink) > 1 else 0][region]
+            if fireSim.windPowers is None:
+                windPowers = fireSim.localWindSpeeds[:, scenario, None, None] ** fireSim.windExponent[region]
+            else:
+                windPowers = fireSim.windPowers[:, scenario, None, None]
+            np.multiply(fireSim.windRates[(Ellipsis,) + region], windPowers, out=self.spreadRates[:, i])
+            self.spreadRates[:, i] += fireSim.baseRates[(Ellipsis,) + region]
+
+    ''' returns the (y, x) slices of every window on map '''
+    def regions(self):
+        return [(slice(y, y + self.height), slice(x, x + self.width)) for y, x in zip(self.yStart, self.xStart)]
+
+    ''' returns True if a fire reached the edge of its window anywhere but on the edge of the map,
+        so that the next step could spread outside of the window; active holds the window's active cells
+        within activeBounds and the ring of cells around them '''
+    def atEdge(self, active):
+        yStart, yEnd, xStart, xEnd = self.activeBounds
+        reached = np.zeros(len(self.scenarios), dtype=bool)
+        if yStart == 0:
+            reached |= active[:, 0].any(axis=1) & (self.yStart > 0)
+        if yEnd == self.height:
+            reached |= active[:, -1].any(axis=1) & (self.yStart + self.height < self.fireSim.yBoundary)
+        if xStart == 0:
+            reached |= active[:, :, 0].any(axis=1) & (self.xStart > 0)
+        if xEnd == self.width:
+            reached |= active[:, :, -1].any(axis=1) & (self.xStart + self.width < self.fireSim.xBoundary)
+        return bool(reached.any())
+
+    ''' copies the windows back into the simulator's arrays and updates its bounds of the active cells '''
+    def scatter(self):
+        fireSim = self.fireSim
+        for i, (scenario, region) in enumerate(zip(self.scenarios, self.regions())):
+            fireSim.fireStatus[scenario][region] = self.fireStatus[i]
+            fireSim.burnFraction[scenario][region] = self.burnFraction[i]
+            fireSim.burnoutTime[scenario][region] = self.burnoutTime[i]
+            fireSim.history.ignitionHour[scenario][region] = self.ignitionHour[i]
+            fireSim.history.burnoutHour[scenario][region] = self.burnoutHour[i]
+            rows, cols = np.nonzero(self.fireStatus[i] == sim.FireStatus.active.value)
+            if len(rows) == 0:
+                fireSim.activeBounds[scenario] = 0
+            else:
+                fireSim.activeBounds[scenario] = (self.yStart[i] + rows.min(), self.yStart[i] + rows.max() + 1,
+                                                  self.xStart[i] + cols.min(), self.xStart[i] + cols.max() + 1)
+
+''' cellular automaton alternative to sim.Simulator; rather than growing a perimeter from
+    individual points, it advances the whole map in timesteps of at most 1/stepsPerHour hours.
+    every unburnt cell accumulates a burn fraction from the fastest burning neighbor's
+    Rothermel rate of spread and ignites once the fraction reaches 1. the cost of a step only
+    depends on the extent of the burning cells, never on the shape of the perimeter. fire can cross at most
+    one cell per step, so each hour takes as many steps as the fastest rate of spread in cells per hour
+    whenever that exceeds stepsPerHour.
+    all fire state carries a leading scenario axis so that several scenarios of the same ignition,
+    each with its own wind and fuel moisture, advance together over the shared terrain arrays;
+    fuelMoistures optionally overrides the fuel's moisture, one value per scenario '''
+class AutomatonSimulator:
+    def __init__(self, elevationData, xScale, yScale, fuelTypes=None, stepsPerHour=STEPS_PER_HOUR,
+                 scenarios=1, fuelMoistures=None):
+        self.elevation = np.asarray(elevationData, dtype=np.float64)
+        self.yBoundary, self.xBoundary = self.elevation.shape
+        self.xPointScale = xScale
+        self.yPointScale = yScale
+        self.stepsPerHour = stepsPerHour
+        if fuelMoistures is not None and len(fuelMoistures) != scenarios:
+            raise ValueError(f"expected {scenarios} fuel moistures, got {len(fuelMoistures)}")
+        self.scenarios = scenarios
+        self.fuelMoistures = fuelMoistures
+        if fuelTypes is None:
+            fuelTypes = np.ones(self.elevation.shape, dtype=np.ubyte) # const fuel source, as in sim.FirePoint
+        self.fuelTypes = fuelTypes
+        shape = (scenarios,) + self.elevation.shape
+        self.fireStatus = np.full(shape, sim.FireStatus.unburnt.value, dtype=np.uint8)
+        self.burnFraction = np.zeros(shape, dtype=np.float32)
+        # time (hours since the fire started) at which an active cell burns out
+        self.burnoutTime = np.zeros(shape, dtype=np.float32)
+        self.burnTime = fuelPropertyGrid(fuelTypes, "burnTime").astype(np.float32)
+        # (scenarios, 4) yStart, yEnd, xStart, xEnd of each scenario's active cells, empty when nothing burns
+        self.activeBounds = np.zeros((scenarios, 4), dtype=np.intp)
+        self.windVector = None # (scenarios, 2)
+        self.windPowers = None # (8, scenarios) local wind speed ** windExponent towards each neighbor
+        # upper bound of the rate of spread in cells per hour of each scenario and of all, under the current wind
+        self.maxSpreadRates = np.zeros(scenarios)
+        self.maxSpreadRate = 0.0
+        self.hour = 0 # hour being simulated, 0 while starting the fire
+        self.time = 0.0 # hours since the fire started
+        self.history = sim.FireHistory(shape)
+        self.precomputeTerrain()
+    def __repr__(self):
+        return self.__str__()
+    def __str__(self):
+        return f"width: {self.xBoundary}, height: {self.yBoundary}, " + \
+               f"xScale: {self.xPointScale}, yScale: {self.yPointScale}, " + \
+               f"stepsPerHour: {self.stepsPerHour}, scenarios: {self.scenarios}"
+
+    ''' precomputes every weather independent term of the rate of spread from each cell
+        to each of its neighbors; cells on the map edge get a rate of 0 towards the outside.
+        the rate towards neighbor k is (baseRates[k] + windRates[k] * windPower) * inverseHeatSink
+        of the neighbor, in cells per hour '''
+    def precomputeTerrain(self):
+        shape = (len(NEIGHBORS),) + self.elevation.shape
+        sav = fuelPropertyGrid(self.fuelTypes, "SAV")
+        packingRatio = fuelPropertyGrid(self.fuelTypes, "packingRatio")
+        relativePackingRatio = fuelPropertyGrid(self.fuelTypes, "relativePackingRatio")
+        if self.fuelMoistures is None:
+            moisture = fuelPropertyGrid(self.fuelTypes, "fuelMoisture")[None]
+        else:
+            moisture = np.asarray(self.fuelMoistures, dtype=np.float64)[:, None, None]
+        heatSink = sim.rothermelHeatSink(fuelPropertyGrid(self.fuelTypes, "bulkDensity"),
+                                         fuelPropertyGrid(self.fuelTypes, "effectiveHeatingNumber"), moisture)
+        self.inverseHeatSink = (1 / heatSink).astype(np.float32) # (1 or scenarios, y, x)
+        heatSource = sim.REACTION_INTENSITY * sim.rothermelPropagatingFlux(sav, packingRatio)
+        # wind factor = windCoefficient * localWindSpeed^windExponent, see sim.rothermelWindFactor
+        windCoefficient = sim.rothermelWindFactor(sav, relativePackingRatio, 1.0)
+        exponent = 0.02526 * (sav ** 0.54)
+        # a single fuel has one exponent, which turns the wind term into one number per neighbor and scenario
+        self.windExponent = float(exponent.flat[0]) if (exponent == exponent.flat[0]).all() else \
+                            exponent.astype(np.float32)
+        self.exponentRange = (float(exponent.min()), float(exponent.max()))
+
+        self.baseRates = np.zeros(shape, dtype=np.float32) # rate * heat sink without wind
+        self.windRates = np.zeros(shape, dtype=np.float32) # rate * heat sink per unit of wind power
+        for k, (dY, dX) in enumerate(NEIGHBORS):
+            ySrc, yDst = neighborSlices(dY, self.yBoundary)
+            xSrc, xDst = neighborSlices(dX, self.xBoundary)
+            src, dst = (ySrc, xSrc), (yDst, xDst)
+            distance = np.hypot(dX * self.xPointScale, dY * self.yPointScale)
+            tanTheta = (self.elevation[dst] - self.elevation[src]) / distance
+            spreadScale = heatSource[src] * sim.FEET_PER_MIN_TO_METERS_PER_HOUR / distance
+            self.baseRates[k][src] = spreadScale * (1 + sim.rothermelSlopeFactor(packingRatio[src], tanTheta))
+            self.windRates[k][src] = spreadScale * windCoefficient[src]
+        # bounds of the rates of spread, used to choose the number of steps per hour
+        self.maxBaseRates = self.baseRates.max(axis=(1, 2))
+        self.maxWindRates = self.windRates.max(axis=(1, 2))
+        self.maxInverseHeatSink = self.inverseHeatSink.max(axis=(1, 2))
+
+    ''' sets the wind vector and the wind speed towards every neighbor;
+        windSpeed (mph) and windDirection are either single values shared by every scenario
+        or sequences with one value per scenario '''
+    def setWindVector(self, windSpeed, windDirection):
+        speeds = np.broadcast_to(np.asarray(windSpeed, dtype=np.float64), (self.scenarios,))
+        directions = np.broadcast_to(np.asarray(windDirection, dtype=np.float64), (self.scenarios,))
+        s = speeds * 5280 / 60 # convert windSpeed from mph to feet/min
+        self.windVector = np.array([sim.calculateWindVector(si, di) for si, di in zip(s, directions)])
+        # (8, scenarios) wind speed in the direction of each neighbor, as in Simulator.windFactor
+        v = np.array([(dX * self.xPointScale, dY * self.yPointScale) for dY, dX in NEIGHBORS]) * 3.28084 # feet
+        vectorScalar = v.dot(self.windVector.T) / (v * v).sum(axis=1)[:, None]
+        localWindSpeeds = np.maximum(vectorScalar, 0) * np.hypot(v[:, 0], v[:, 1])[:, None] # disregard wind in hurting direction
+        self.localWindSpeeds = localWindSpeeds.astype(np.float32)
+        if isinstance(self.windExponent, float):
+            self.windPowers = self.localWindSpeeds ** np.float32(self.windExponent)
+        else:
+            self.windPowers = None # depends on the fuel of each cell, see ScenarioWindows
+        maxWindPowers = np.maximum(localWindSpeeds ** self.exponentRange[0], localWindSpeeds ** self.exponentRange[1])
+        maxRates = (self.maxBaseRates[:, None] + self.maxWindRates[:, None] * maxWindPowers) * self.maxInverseHeatSink
+        self.maxSpreadRates = maxRates.max(axis=0)
+        self.maxSpreadRate = float(self.maxSpreadRates.max())
+
+    ''' starts a fire with radius of size size (meters) at dX, dY position as a percentage on map,
+        in every scenario '''
+    def startFire(self, xPercent, yPercent, size):
+        xStart, xEnd, yStart, yEnd = sim.getFireStartBounds(self.xBoundary, self.yBoundary,
+                                        self.xPointScale, self.yPointScale, xPercent, yPercent, size)
+        region = (Ellipsis, slice(yStart, yEnd), slice(xStart, xEnd))
+        unburnt = self.fireStatus[region] == sim.FireStatus.unburnt.value
+        self.fireStatus[region][unburnt] = sim.FireStatus.active.value
+        burnTime = np.broadcast_to(self.burnTime[region], unburnt.shape)
+        self.burnoutTime[region][unburnt] = self.time + burnTime[unburnt]
+        self.history.ignitionHour[region][unburnt] = self.hour
+        if yEnd > yStart and xEnd > xStart:
+            for bounds in self.activeBounds:
+                if bounds[1] > bounds[0]:
+                    bounds[:] = min(bounds[0], yStart), max(bounds[1], yEnd), min(bounds[2], xStart), max(bounds[3], xEnd)
+                else:
+                    bounds[:] = yStart, yEnd, xStart, xEnd
+
+    ''' advances every scenario of the windows by one timestep of dt hours ending at time; only burning
+        cells and their neighbors can change, so the step is restricted to the bounding box of the windows'
+        active cells. returns False once nothing burns or a fire reached the edge of its window '''
+    def step(self, windows, time, dt):
+        if windows.activeBounds is None:
+            return False
+        yStart, yEnd, xStart, xEnd = windows.activeBounds
+        yStart, xStart = max(yStart - 1, 0), max(xStart - 1, 0)
+        window = (Ellipsis, slice(yStart, yEnd + 1), slice(xStart, xEnd + 1))
+        fireStatus = windows.fireStatus[window]
+        burnFraction = windows.burnFraction[window]
+        burnoutTime = windows.burnoutTime[window]
+        active = fireStatus == sim.FireStatus.active.value
+        unburnt = fireStatus == sim.FireStatus.unburnt.value
+        yWindow, xWindow = fireStatus.shape[1:]
+
+        # fastest rate of spread into each cell from any of its burning neighbors
+        increment = np.zeros(fireStatus.shape, dtype=np.float32)
+        for k, (dY, dX) in enumerate(NEIGHBORS):
+            ySrc, yDst = neighborSlices(dY, yWindow)
+            xSrc, xDst = neighborSlices(dX, xWindow)
+            src, dst = (Ellipsis, ySrc, xSrc), (Ellipsis, yDst, xDst)
+            incoming = windows.spreadRates[k][window][src] * active[src]
+            np.maximum(increment[dst], incoming, out=increment[dst])
+        increment *= windows.inverseHeatSink[window] # heat sink of the cell being ignited
+        increment *= unburnt
+        increment *= dt
+        burnFraction += increment
+        ignite = unburnt & (burnFraction >= 1)
+
+        burntOut = active & (burnoutTime < time + dt / 2) # within half a step of burning out
+        fireStatus[burntOut] = sim.FireStatus.burnt.value
+        fireStatus[ignite] = sim.FireStatus.active.value
+        np.copyto(burnoutTime, time + windows.burnTime[window], where=ignite)
+        np.copyto(windows.burnoutHour[window], self.hour, where=burntOut)
+        np.copyto(windows.ignitionHour[window], self.hour, where=ignite)
+
+        # fit the bounds to the cells still burning
+        active &= ~burntOut
+        active |= ignite
+        burning = active.any(axis=0)
+        rows = np.flatnonzero(burning.any(axis=1))
+        if len(rows) == 0:
+            windows.activeBounds = None
+            return False
+        cols = np.flatnonzero(burning.any(axis=0))
+        windows.activeBounds = (yStart + int(rows[0]), yStart + int(rows[-1]) + 1,
+                                xStart + int(cols[0]), xStart + int(cols[-1]) + 1)
+        return not windows.atEdge(active)
+
+    ''' runs a single hour of fire growth given the hour's weather,
+        same entry point as Simulator.growFireFront '''
+    def growFireFront(self, weather):
+        self.setWindVector(weather.windSpeed, weather.windDirection)
+        self.advanceHour()
+    ''' runs the timesteps of one hour with the current wind, taking more than stepsPerHour steps
+        when the group's fastest rate of spread would otherwise cross more than one cell per step.
+        each group of scenarios steps on windows sized for its fires' reach in the rest of the hour,
+        which are cut out again whenever a fire reaches the edge of its window '''
+    def advanceHour(self):
+        self.hour += 1
+        for group in self.scenarioGroups():
+            steps = max(self.stepsPerHour, int(np.ceil(self.maxSpreadRates[group].max())))
+            step = 0
+            while step < steps and len(group) > 0:
+                margin = int(np.ceil(self.maxSpreadRates[group].max() * (steps - step) / steps)) + 2
+                windows = ScenarioWindows(self, group, margin)
+                while step < steps:
+                    step += 1
+                    if not self.step(windows, self.time + step / steps, 1 / steps):
+                        break
+                windows.scatter()
+                group = group[self.activeBounds[group, 1] > self.activeBounds[group, 0]]
+        self.time = float(self.hour)
+
+    ''' splits the burning scenarios into groups whose windows for the coming hour are of similar size,
+        so that small fires aren't stepped over the windows of large ones; scenarios never interact,
+        so every group can run its hour on its own '''
+    def scenarioGroups(self):
+        bounds = self.activeBounds
+        burning = np.flatnonzero(bounds[:, 1] > bounds[:, 0])
+        reach = 2 * (np.ceil(self.maxSpreadRates[burning]) + 2)
+        area = (bounds[burning, 1] - bounds[burning, 0] + reach) * (bounds[burning, 3] - bounds[burning, 2] + reach)
+        order = np.argsort(area, kind="stable")
+        groups, start = [], 0
+        for i in range(1, len(order) + 1):
+            if i == len(order) or area[order[i]] > GROUP_AREA_RATIO * area[order[start]]:
+                groups.append(burning[order[start:i]])
+                start = i
+        return groups
+
+    ''' returns True while any cell of any scenario is still burning '''
+    def isBurning(self):
+        return bool((self.activeBounds[:, 1] > self.activeBounds[:, 0]).any())
+    ''' returns the fire status of every cell on map of the scenario as a uint8 array of FireStatus values '''
+    def fireStatusGrid(self, scenario=0):
+        return self.fireStatus[scenario].copy()
+    ''' returns a (scenarios, y, x) bool array of every cell that has caught fire in each scenario '''
+    def burnedMasks(self):
+        return self.fireStatus != sim.FireStatus.unburnt.value
+
+''' runs every scenario of the same ignition together for the given hours, scenario i with
+    constant wind windSpeeds[i] (mph) from windDirections[i] and fuel moisture fuelMoistures[i]
+    (None keeps the fuel's own moisture); start is (xPercent, yPercent, size) as in startFire.
+    scenarios stepped together share the timestep, which the fastest of them shortens when needed.
+    returns a (scenarios, y, x) bool array of each scenario's burned mask '''
+def runSweep(elevationData, xScale, yScale, start, hours, windSpeeds, windDirections,
+             fuelMoistures=None, stepsPerHour=STEPS_PER_HOUR):
+    if len(windSpeeds) != len(windDirections):
+        raise ValueError("expected one wind direction per wind speed")
+    fireSim = AutomatonSimulator(elevationData, xScale, yScale, stepsPerHour=stepsPerHour,
+                                 scenarios=len(windSpeeds), fuelMoistures=fuelMoistures)
+    fireSim.startFire(*start)
+    fireSim.setWindVector(windSpeeds, windDirections)
+    for _ in range(hours):
+        fireSim.advanceHour()
+    return fireSim.burnedMasks()
@@ -0,0 +1,67 @@
+''' benchmark of the automaton engine's batched parameter sweep; runs a sweep over wind directions
+    once with every scenario batched in one AutomatonSimulator and once as separate single scenario
+    runs, then prints the wall time of both and whether their burned masks agree
+
+    usage: python3 benchmark_sweep.py [--dem DEM.tif | --synthetic ridge] [--directions 16] [--speed 10]
+                                      [--hours 6] [--size 300] [--repeat 3]
+'''
+import argparse, sys, time
+import numpy as np
+import automaton, harness # local modules
+
+''' returns the best wall time of repeat calls of func and the result of the last '''
+def bestTime(func, repeat):
+    best = None
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - startTime
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="compare a batched automaton sweep to separate runs")
+    parser.add_argument("--dem", help="DEM.tif to sweep over, defaults to a synthetic DEM")
+    parser.add_argument("--synthetic", default="ridge", choices=harness.SYNTHETIC_DEMS.keys())
+    parser.add_argument("--size", type=int, default=300, help="size of the synthetic DEM in cells")
+    parser.add_argument("--scale", type=float, default=10.0, help="meters per synthetic DEM cell")
+    parser.add_argument("--directions", type=int, default=16, help="wind directions, evenly spaced")
+    parser.add_argument("--speed", type=float, default=10.0, help="wind speed in mph")
+    parser.add_argument("--hours", type=int, default=6)
+    parser.add_argument("--start", type=float, nargs=3, default=[0.5, 0.5, 30],
+                        metavar=("XPERCENT", "YPERCENT", "RADIUS"))
+    parser.add_argument("--steps", type=int, default=automaton.STEPS_PER_HOUR,
+                        help="minimum automaton timesteps per hour")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each, the best is reported")
+    args = parser.parse_args()
+
+    if args.dem is None:
+        name, elevationData, dX, dY = args.synthetic, harness.SYNTHETIC_DEMS[args.synthetic](args.size), \
+                                      args.scale, args.scale
+    else:
+        import elevation # local module, needs gdal
+        name = args.dem
+        dX, dY, elevationData = elevation.getElevationData(args.dem)
+    start = (args.start[0], args.start[1], int(args.start[2]))
+    directions = list(np.arange(args.directions) * 360 / args.directions)
+    speeds = [args.speed] * args.directions
+
+    batchedSeconds, batched = bestTime(lambda: automaton.runSweep(elevationData, dX, dY, start, args.hours,
+                                                                  speeds, directions, stepsPerHour=args.steps),
+                                       args.repeat)
+    separateSeconds, separate = bestTime(lambda: [automaton.runSweep(elevationData, dX, dY, start, args.hours,
+                                                                     [speed], [direction], stepsPerHour=args.steps)[0]
+                                                  for speed, direction in zip(speeds, directions)],
+                                         args.repeat)
+    differentCells = int(sum((mask != other).sum() for mask, other in zip(batched, separate)))
+
+    print(f"benchmark: {args.directions} wind directions at {args.speed} mph for {args.hours} hours on " +
+          f"{name} {elevationData.shape[1]}x{elevationData.shape[0]}, best of {args.repeat}")
+    print(f"  batched  {batchedSeconds:8.3f}s")
+    print(f"  separate {separateSeconds:8.3f}s  ({separateSeconds / batchedSeconds:.2f}x the batched time)")
+    print(f"  cells burned differently: {differentCells}")
+    if differentCells:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
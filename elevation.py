@@ -1,22 +1,55 @@
-from osgeo import gdal, osr
-from osgeo.gdalconst import GA_ReadOnly
+import hashlib, json, os, sys
+import numpy as np
+
+CACHE_VERSION = 2 # version 1 could hold nodata cells
+CACHE_SAMPLE_SIZE = 1 << 20 # bytes hashed from the start, middle and end of the source DEM
+NODATA = -32768.0 # marks the cells outside the source DEM when reprojecting a DEM without a nodata value
 
 ''' custom error '''
 class FileNotSupportedError(Exception):
     def __init__(self, message):
         self.message = message
-    
+
     def __str__(self):
         return self.message
 
-''' takes in the filename of a tif as a string, returns the map distance of each pixel and elevation matrix '''
-def getElevationData(filename):
+''' takes in the filename of a tif as a string, returns the map distance of each pixel and elevation matrix;
+    the first call ingests the DEM into a memory-mapped cache next to it, which later calls
+    load directly as long as the DEM is unchanged '''
+def getElevationData(filename, useCache=True):
+    if useCache:
+        cached = readCache(filename)
+        if cached is not None:
+            return cached
+    ras_data = openDEM(filename)
+    if ras_data is None:
+        return None
+    dX, dY, elevationData, geoTransform, wkt = readDEM(ras_data)
+    if useCache:
+        try:
+            return writeCache(filename, dX, dY, elevationData, geoTransform, wkt)
+        except OSError: # e.g read-only directory, fall back to the data in memory
+            pass
+    return dX, dY, elevationData
+
+''' converts the DEM to its cache ahead of time, returns the cache's data filename '''
+def ingestDEM(filename):
+    ras_data = openDEM(filename)
+    if ras_data is None:
+        raise FileNotSupportedError("could not open image file")
+    writeCache(filename, *readDEM(ras_data))
+    return getCachePaths(filename)[0]
+
+''' opens the DEM with gdal, converting gdal's errors '''
+def openDEM(filename):
+    from osgeo import gdal
+    from osgeo.gdalconst import GA_ReadOnly
     gdal.AllRegister()
     gdal.UseExceptions()
 
     # Open Image
     try:
-        ras_data = gdal.Open(filename, GA_ReadOnly)
+        return gdal.Open(filename, GA_ReadOnly)
     except (FileNotFoundError, RuntimeError) as e: # convert gdal's RuntimeError to FileNotFoundError
         errorString = str(e)
         if "No such file or directory" in errorString:
@@ -24,28 +57,31 @@ def getElevationData(filename):
         if "not recognized as a supported file format" in errorString:
             raise FileNotSupportedError("file not supported\n\tWildfireSim only supports .tif files")
         raise e
-    if ras_data is None:
-        return None
-    
+
+''' returns the map distance of each pixel, elevation matrix, geotransform and spatial reference (wkt)
+    of an open DEM, reprojecting DEMs that are not in UTM coordinates and filling nodata cells '''
+def readDEM(ras_data):
     # get DEM metadata
-    info = ras_data.GetGeoTransform()
     spatial = ras_data.GetSpatialRef()
-    projected = bool(spatial.IsProjected())
+    if spatial is None:
+        raise FileNotSupportedError("file not supported\n\tDEM has no spatial reference")
+    if not spatial.IsProjected():
+        ras_data = reprojectToUTM(ras_data)
+        spatial = ras_data.GetSpatialRef()
+    ras_data = fillNoData(ras_data)
+    info = ras_data.GetGeoTransform()
     # dX represents the change in meters for 1 change in pixel in the x direction
     dX = info[1]
     # dY represents the change in meters for 1 change in pixel in the y direction
     dY = info[-1]
-    # if the pixel size is not 1 or 10 meters or if the DEM is not projected to UTM
-    if dX not in [1.0, 5.0, 10.0] and not projected:
-        raise FileNotSupportedError("file not supported\n\tDEM should be in UTM coordinate format (meters)")
- 
+
     # read in the raster data and get elevation matrix from it
     band1 = ras_data.GetRasterBand(1)
     rows = ras_data.RasterYSize
     cols = ras_data.RasterXSize
     elevationData = band1.ReadAsArray(0,0,cols,rows)
 
-    return abs(dX), abs(dY), elevationData
+    return abs(dX), abs(dY), elevationData, list(info), spatial.ExportToWkt()
 
     '''
     other useful attributes:
@@ -54,4 +90,107 @@ def getElevationData(filename):
         numrows = len(elevationData)
         numcols = len(elevationData[0])
     '''
-    
\ No newline at end of file
+
+''' reprojects a geographic (latitude/longitude) DEM to the UTM zone of its center, in memory '''
+def reprojectToUTM(ras_data):
+    from osgeo import gdal, osr
+    info = ras_data.GetGeoTransform()
+    x = info[0] + info[1] * ras_data.RasterXSize / 2 + info[2] * ras_data.RasterYSize / 2
+    y = info[3] + info[4] * ras_data.RasterXSize / 2 + info[5] * ras_data.RasterYSize / 2
+    # convert the center to longitude, latitude in case the DEM uses a datum other than WGS84
+    source = ras_data.GetSpatialRef()
+    source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    wgs84 = osr.SpatialReference()
+    wgs84.ImportFromEPSG(4326)
+    wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    lon, lat, _ = osr.CoordinateTransformation(source, wgs84).TransformPoint(x, y)
+
+    zone = int((lon + 180) // 6) % 60 + 1
+    epsg = (32600 if lat >= 0 else 32700) + zone # WGS84 / UTM north or south
+    nodata = ras_data.GetRasterBand(1).GetNoDataValue()
+    # the rotated map gains corners outside the source DEM, which are marked as nodata
+    return gdal.Warp("", ras_data, format="MEM", dstSRS=f"EPSG:{epsg}", resampleAlg="bilinear",
+                     outputType=gdal.GDT_Float32, srcNodata=nodata,
+                     dstNodata=NODATA if nodata is None else nodata)
+
+''' returns the DEM with its nodata cells interpolated from the nearest valid cells, so that voids and
+    the corners added by reprojecting don't read as cliffs to the simulation; DEMs holding nodata are
+    copied into memory first since the source file is opened read only '''
+def fillNoData(ras_data):
+    from osgeo import gdal
+    band = ras_data.GetRasterBand(1)
+    nodata = band.GetNoDataValue()
+    if nodata is None:
+        return ras_data
+    elevationData = band.ReadAsArray()
+    missing = np.isnan(elevationData) if np.isnan(nodata) else elevationData == nodata
+    if not missing.any():
+        return ras_data
+    if missing.all():
+        raise FileNotSupportedError("file not supported\n\tDEM has no elevation data")
+    if ras_data.GetDriver().ShortName != "MEM":
+        ras_data = gdal.GetDriverByName("MEM").CreateCopy("", ras_data)
+        band = ras_data.GetRasterBand(1)
+    gdal.FillNodata(band, None, max(ras_data.RasterXSize, ras_data.RasterYSize), 0)
+    return ras_data
+
+''' returns the (data, sidecar) filenames of the DEM's cache '''
+def getCachePaths(filename):
+    return filename + ".wfcache.npy", filename + ".wfcache.json"
+
+''' returns the size, mtime and a digest of the DEM used to decide whether its cache is current;
+    the digest covers the start, middle and end of the file so checking it stays cheap for multi-GB DEMs '''
+def getSourceSignature(filename):
+    stat = os.stat(filename)
+    digest = hashlib.sha256(str(stat.st_size).encode())
+    with open(filename, "rb") as f:
+        for offset in sorted({0, max(stat.st_size // 2 - CACHE_SAMPLE_SIZE // 2, 0),
+                              max(stat.st_size - CACHE_SAMPLE_SIZE, 0)}):
+            f.seek(offset)
+            digest.update(f.read(CACHE_SAMPLE_SIZE))
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "digest": digest.hexdigest()}
+
+''' returns the map distance of each pixel and memory-mapped elevation matrix from the DEM's cache,
+    None if there is no cache or the DEM changed since it was written '''
+def readCache(filename):
+    dataFile, sidecarFile = getCachePaths(filename)
+    try:
+        with open(sidecarFile) as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") != CACHE_VERSION or sidecar.get("source") != getSourceSignature(filename):
+            return None
+        elevationData = np.load(dataFile, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return sidecar["xScale"], sidecar["yScale"], elevationData
+
+''' writes the elevation matrix uncompressed with a sidecar holding its metadata,
+    returns the map distance of each pixel and memory-mapped elevation matrix '''
+def writeCache(filename, dX, dY, elevationData, geoTransform, wkt):
+    dataFile, sidecarFile = getCachePaths(filename)
+    sidecar = {
+        "version": CACHE_VERSION,
+        "source": getSourceSignature(filename),
+        "xScale": dX,
+        "yScale": dY,
+        "geoTransform": geoTransform,
+        "spatialReference": wkt,
+        "shape": list(elevationData.shape),
+        "dtype": str(elevationData.dtype),
+    }
+    # write to temporary files first so an interrupted ingest never leaves a half written cache
+    with open(dataFile + ".tmp", "wb") as f:
+        np.save(f, elevationData)
+    with open(sidecarFile + ".tmp", "w") as f:
+        json.dump(sidecar, f, indent=2)
+    os.replace(dataFile + ".tmp", dataFile)
+    os.replace(sidecarFile + ".tmp", sidecarFile)
+    return dX, dY, np.load(dataFile, mmap_mode="r")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("usage: python3 elevation.py DEM.tif ...")
+        print("\tconverts each DEM into WildfireSim's memory-mapped cache ahead of time")
+        sys.exit(1)
+    for mapFile in sys.argv[1:]:
+        print(f"{mapFile} -> {ingestDEM(mapFile)}")
@@ -0,0 +1,16 @@
+import sim, automaton # local modules
+
+''' names of the available simulation engines, the first is the default:
+    perimeter  : sim.Simulator, grows the convex perimeter of the fire point by point
+    automaton  : automaton.AutomatonSimulator, advances the whole map in vectorized timesteps '''
+ENGINES = ["perimeter", "automaton"]
+
+''' creates the simulation engine called name for the elevation data,
+    progress(iteration, total) reports the progress of building the perimeter engine's map,
+    stepsPerHour is the automaton engine's minimum number of timesteps per hour '''
+def createEngine(name, elevationData, xScale, yScale, progress=None, stepsPerHour=automaton.STEPS_PER_HOUR):
+    if name == "perimeter":
+        return sim.Simulator(sim.createMapPoints(elevationData, progress), xScale, yScale)
+    if name == "automaton":
+        return automaton.AutomatonSimulator(elevationData, xScale, yScale, stepsPerHour=stepsPerHour)
+    raise ValueError(f"unknown engine '{name}', must be one of: {', '.join(ENGINES)}")
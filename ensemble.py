@@ -0,0 +1,335 @@
+''' distributed ensemble runs for burn probability; a coordinator splits every
+    (ignition, weather member) scenario over one DEM into work units and serves them over TCP,
+    headless workers on any node pull units, simulate them and stream back each unit's
+    arrival hours, which the coordinator aggregates into burn counts as they come in.
+    units held by a worker that disconnects or exceeds its lease are handed out again.
+
+    usage: python3 ensemble.py coordinator DEM.tif latitude longitude ignitions.csv [options]
+           python3 ensemble.py worker host:port
+           python3 ensemble.py local DEM.tif latitude longitude ignitions.csv --workers 4 [options]
+    coordinator and worker share the key in the WILDFIRESIM_AUTHKEY environment variable;
+    ignitions.csv holds one "xPercent, yPercent, radius" ignition per line
+'''
+import argparse, collections, os, sys, threading, time
+from multiprocessing import Process
+from multiprocessing.connection import Listener, Client
+import numpy as np
+import engines, sim, weather # local modules
+
+DEFAULT_PORT = 6150
+WAIT_SECONDS = 1.0 # how long a worker waits before asking again when every unit is in flight
+
+''' custom error '''
+class EnsembleError(Exception):
+    def __init__(self, message):
+        self.message = "Ensemble: " + str(message)
+
+    def __str__(self):
+        return self.message
+
+''' returns the weather members of an ensemble as lists of (windSpeed, windDirection) per hour;
+    member 0 is the forecast itself, the others scale its wind speed and turn its direction by
+    a random amount drawn once per member '''
+def perturbForecast(forecast, members, speedSpread=0.2, directionSpread=15, seed=0):
+    rng = np.random.default_rng(seed)
+    result = [[(w.windSpeed, w.windDirection) for w in forecast]]
+    for _ in range(members - 1):
+        scale = max(rng.normal(1, speedSpread), 0)
+        turn = rng.normal(0, directionSpread)
+        result.append([(w.windSpeed * scale, (w.windDirection + turn) % 360) for w in forecast])
+    return result
+
+''' reads ignitions.csv, returns list of (xPercent, yPercent, radius) '''
+def readIgnitions(filename):
+    ignitions = []
+    with open(filename) as f:
+        for line in f:
+            if line.strip() == "" or line.startswith("#"):
+                continue
+            x, y, r = line.split(",")
+            ignitions.append((float(x), float(y), int(r)))
+    return ignitions
+
+''' runs one work unit headless, returns its arrival hours cropped to the burned area
+    as (yOffset, xOffset, ignitionHour) '''
+def runUnit(engine, elevationData, dX, dY, unit):
+    fireSim = engines.createEngine(engine, elevationData, dX, dY)
+    fireSim.startFire(*unit["ignition"])
+    for hour, (windSpeed, windDirection) in enumerate(unit["weather"]):
+        fireSim.growFireFront(weather.Weather(time=hour, temperature=None,
+                                              windSpeed=windSpeed, windDirection=windDirection))
+        if not fireSim.isBurning():
+            break
+    ignitionHour = fireSim.history.ignitionHour.reshape(elevationData.shape)
+    rows = np.flatnonzero((ignitionHour != sim.NEVER).any(axis=1))
+    cols = np.flatnonzero((ignitionHour != sim.NEVER).any(axis=0))
+    if len(rows) == 0:
+        return 0, 0, ignitionHour[:0, :0].copy()
+    return int(rows[0]), int(cols[0]), ignitionHour[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1].copy()
+
+''' serves work units to workers and aggregates their results;
+    units are (ignition, weather member) pairs, leaseTimeout is the number of seconds a worker
+    may hold a unit before it is handed out again, maxAttempts the number of times a unit is
+    handed out before it is given up on '''
+class Coordinator:
+    def __init__(self, elevationData, xScale, yScale, ignitions, members, engine="automaton",
+                 leaseTimeout=600, maxAttempts=3):
+        self.elevationData = np.asarray(elevationData)
+        self.xScale = xScale
+        self.yScale = yScale
+        self.engine = engine
+        self.leaseTimeout = leaseTimeout
+        self.maxAttempts = maxAttempts
+        self.units = [{"ignition": ignition, "weather": member} for ignition in ignitions for member in members]
+        self.pending = collections.deque(range(len(self.units)))
+        self.leases = {} # unit id -> (connection id, lease start)
+        self.attempts = collections.Counter()
+        self.completed = set()
+        self.failed = set()
+        self.burnCount = np.zeros(self.elevationData.shape, dtype=np.uint32)
+        self.firstArrival = np.full(self.elevationData.shape, sim.NEVER, dtype=np.uint16)
+        self.condition = threading.Condition()
+        self.listener = None
+    def __repr__(self):
+        return self.__str__()
+    def __str__(self):
+        return f"units: {len(self.units)}, completed: {len(self.completed)}, failed: {len(self.failed)}, " + \
+               f"in flight: {len(self.leases)}, pending: {len(self.pending)}"
+
+    ''' returns True once every unit has completed or failed '''
+    def isDone(self):
+        return len(self.completed) + len(self.failed) == len(self.units)
+
+    ''' hands a unit back out, or gives up on it after maxAttempts; units that already completed
+        are left alone; caller holds condition '''
+    def requeue(self, unitId):
+        self.leases.pop(unitId, None)
+        if unitId in self.completed or unitId in self.failed:
+            return
+        if self.attempts[unitId] >= self.maxAttempts:
+            self.failed.add(unitId)
+            self.condition.notify_all()
+        else:
+            self.pending.append(unitId)
+
+    ''' requeues units whose lease has expired; caller holds condition '''
+    def expireLeases(self):
+        now = time.monotonic()
+        for unitId, (_, start) in list(self.leases.items()):
+            if now - start > self.leaseTimeout and unitId not in self.completed:
+                self.requeue(unitId)
+
+    ''' returns the next unit id for the connection, None if none is pending '''
+    def nextUnit(self, connectionId):
+        with self.condition:
+            self.expireLeases()
+            while self.pending:
+                unitId = self.pending.popleft()
+                if unitId in self.completed or unitId in self.failed:
+                    continue
+                self.attempts[unitId] += 1
+                self.leases[unitId] = (connectionId, time.monotonic())
+                return unitId
+            return None
+
+    ''' adds a unit's arrival hours to the aggregate, ignoring duplicates of completed units '''
+    def addResult(self, unitId, result):
+        yOffset, xOffset, ignitionHour = result
+        with self.condition:
+            if unitId in self.completed:
+                return
+            self.leases.pop(unitId, None)
+            self.failed.discard(unitId)
+            region = (slice(yOffset, yOffset + ignitionHour.shape[0]), slice(xOffset, xOffset + ignitionHour.shape[1]))
+            self.burnCount[region] += ignitionHour != sim.NEVER
+            np.minimum(self.firstArrival[region], ignitionHour, out=self.firstArrival[region])
+            self.completed.add(unitId)
+            self.condition.notify_all()
+
+    ''' requeues a unit that failed on a connection, unless its lease already expired and the unit
+        was handed to another connection since '''
+    def unitFailed(self, unitId, connectionId):
+        with self.condition:
+            if self.leases.get(unitId, (None,))[0] == connectionId:
+                self.requeue(unitId)
+
+    ''' requeues every unit leased to a connection that was lost '''
+    def releaseConnection(self, connectionId):
+        with self.condition:
+            for unitId, (owner, _) in list(self.leases.items()):
+                if owner == connectionId:
+                    self.requeue(unitId)
+
+    ''' talks to one worker until it disconnects or every unit is done '''
+    def handleWorker(self, conn, connectionId):
+        try:
+            conn.send(("map", self.engine, self.elevationData, self.xScale, self.yScale))
+            while True:
+                message = conn.recv()
+                if message[0] == "result":
+                    self.addResult(message[1], message[2])
+                elif message[0] == "error":
+                    print(f"ensemble: unit {message[1]} failed on worker {connectionId}: {message[2]}",
+                          file=sys.stderr)
+                    self.unitFailed(message[1], connectionId)
+                if self.isDone():
+                    conn.send(("done",))
+                    return
+                unitId = self.nextUnit(connectionId)
+                if unitId is None:
+                    conn.send(("wait", WAIT_SECONDS))
+                else:
+                    conn.send(("unit", unitId, self.units[unitId]))
+        except (EOFError, OSError): # worker lost, hand its units to the others
+            pass
+        finally:
+            self.releaseConnection(connectionId)
+            conn.close()
+
+    ''' accepts workers until the listener is closed '''
+    def acceptWorkers(self):
+        connectionId = 0
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError: # listener closed
+                return
+            except Exception as e: # failed handshake, e.g wrong authkey
+                print(f"ensemble: rejected worker: {e}", file=sys.stderr)
+                continue
+            connectionId += 1
+            threading.Thread(target=self.handleWorker, args=(conn, connectionId), daemon=True).start()
+
+    ''' starts listening on address (host, port) for workers; returns the bound address '''
+    def start(self, address, authkey):
+        self.listener = Listener(address, authkey=authkey)
+        threading.Thread(target=self.acceptWorkers, daemon=True).start()
+        return self.listener.address
+
+    ''' waits until every unit is done, expiring leases of hung workers meanwhile,
+        then stops listening; returns the results '''
+    def wait(self):
+        with self.condition:
+            while not self.isDone():
+                self.condition.wait(timeout=min(self.leaseTimeout, 5))
+                self.expireLeases()
+        self.listener.close()
+        return self.results()
+
+    ''' returns the aggregated results as a dictionary '''
+    def results(self):
+        completed = len(self.completed)
+        return {
+            "burnProbability": self.burnCount / completed if completed else np.zeros(self.burnCount.shape),
+            "burnCount": self.burnCount,
+            "firstArrivalHour": self.firstArrival,
+            "completedUnits": completed,
+            "failedUnits": sorted(self.failed),
+        }
+
+''' pulls and runs units from the coordinator at address until it reports that every unit is done '''
+def runWorker(address, authkey):
+    conn = Client(address, authkey=authkey)
+    try:
+        _, engine, elevationData, dX, dY = conn.recv()
+        conn.send(("request",))
+        while True:
+            message = conn.recv()
+            if message[0] == "done":
+                return
+            if message[0] == "wait":
+                time.sleep(message[1])
+                conn.send(("request",))
+                continue
+            _, unitId, unit = message
+            try:
+                result = runUnit(engine, elevationData, dX, dY, unit)
+            except Exception as e:
+                conn.send(("error", unitId, repr(e)))
+                continue
+            conn.send(("result", unitId, result))
+    except (EOFError, OSError): # coordinator went away
+        return
+    finally:
+        conn.close()
+
+''' runs an ensemble with a coordinator and the given number of worker processes on this machine '''
+def runLocal(elevationData, xScale, yScale, ignitions, members, workers=2, engine="automaton", **options):
+    authkey = os.urandom(16)
+    coordinator = Coordinator(elevationData, xScale, yScale, ignitions, members, engine, **options)
+    address = coordinator.start(("127.0.0.1", 0), authkey)
+    processes = [Process(target=runWorker, args=(address, authkey)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = coordinator.wait()
+    for process in processes:
+        process.join()
+    return results
+
+''' returns the shared key from WILDFIRESIM_AUTHKEY '''
+def getAuthkey():
+    authkey = os.getenv("WILDFIRESIM_AUTHKEY")
+    if authkey is None:
+        raise EnsembleError("must set 'WILDFIRESIM_AUTHKEY' environment variable with the shared key")
+    return authkey.encode()
+
+''' returns (host, port) of a "host:port" string '''
+def parseAddress(text):
+    host, _, port = text.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise EnsembleError(f"address must be host:port, given {text}")
+
+''' loads the DEM, ignitions and weather members of a coordinator or local run '''
+def loadEnsemble(args):
+    import main # local module, handles the DEM's and weather's errors
+    dX, dY, elevationData = main.getMapData(args.dem)
+    forecast = main.getWeatherData(*main.getWeatherRequest(args.latitude, args.longitude))[:args.hours]
+    members = perturbForecast(forecast, args.members, seed=args.seed)
+    return elevationData, dX, dY, readIgnitions(args.ignitions), members
+
+def main():
+    parser = argparse.ArgumentParser(description="distributed WildfireSim burn probability ensembles")
+    modes = parser.add_subparsers(dest="mode", required=True)
+    worker = modes.add_parser("worker", help="pull and run units from a coordinator")
+    worker.add_argument("address", help="coordinator's host:port")
+    for name in ["coordinator", "local"]:
+        mode = modes.add_parser(name)
+        mode.add_argument("dem")
+        mode.add_argument("latitude")
+        mode.add_argument("longitude")
+        mode.add_argument("ignitions", help="csv file of xPercent, yPercent, radius per ignition")
+        mode.add_argument("--members", type=int, default=10, help="weather members per ignition")
+        mode.add_argument("--hours", type=int, default=24, help="hours of forecast to simulate")
+        mode.add_argument("--seed", type=int, default=0, help="seed of the weather member perturbations")
+        mode.add_argument("--engine", choices=engines.ENGINES, default="automaton")
+        mode.add_argument("--lease", type=float, default=600, help="seconds before a unit is handed out again")
+        mode.add_argument("--attempts", type=int, default=3, help="times a unit is handed out before failing")
+        mode.add_argument("--output", required=True, help=".npz file of the aggregated results")
+    modes.choices["coordinator"].add_argument("--bind", default=f"0.0.0.0:{DEFAULT_PORT}", help="host:port")
+    modes.choices["local"].add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    try:
+        if args.mode == "worker":
+            runWorker(parseAddress(args.address), getAuthkey())
+            return
+        elevationData, dX, dY, ignitions, members = loadEnsemble(args)
+        options = {"leaseTimeout": args.lease, "maxAttempts": args.attempts}
+        if args.mode == "local":
+            results = runLocal(elevationData, dX, dY, ignitions, members, args.workers, args.engine, **options)
+        else:
+            coordinator = Coordinator(elevationData, dX, dY, ignitions, members, args.engine, **options)
+            address = coordinator.start(parseAddress(args.bind), getAuthkey())
+            print(f"ensemble: serving {len(coordinator.units)} units on {address[0]}:{address[1]}")
+            results = coordinator.wait()
+    except EnsembleError as e:
+        print("WildfireSim: " + e.message, file=sys.stderr)
+        sys.exit(1)
+    np.savez_compressed(args.output, **results)
+    print(f"ensemble: {results['completedUnits']} units completed, {len(results['failedUnits'])} failed, " +
+          f"wrote {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import glob, os, shutil, subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import sim # local module
+
+FIRE_COLORS = {
+    sim.FireStatus.active.value: (255, 0, 0), # red, same as the live Graphics window
+    sim.FireStatus.burnt.value: (0, 0, 0),    # black
+}
+
+baseLayer = None # set once per worker process by initWorker()
+
+''' renders the static elevation layer as an RGB uint8 image with one pixel per map point,
+    using the same colormap and contour levels as Graphics.plotElevationData;
+    row 0 of the image is row 0 of the map '''
+def renderBaseLayer(elevationData):
+    from matplotlib import colormaps
+    from matplotlib.colors import BoundaryNorm
+    from matplotlib.ticker import MaxNLocator
+    levels = MaxNLocator(nbins=8).tick_values(elevationData.min(), elevationData.max())
+    cmap = colormaps["viridis"]
+    norm = BoundaryNorm(levels, cmap.N)
+    rgba = cmap(norm(elevationData), bytes=True)
+    return np.ascontiguousarray(rgba[:, :, :3])
+
+''' stores the base layer in the worker process so it is only sent to each worker once '''
+def initWorker(base):
+    global baseLayer
+    baseLayer = base
+
+''' composites a fire status grid over the base layer and writes it as a PNG;
+    runs inside a worker process '''
+def renderFrame(statusGrid, filename):
+    from matplotlib import pyplot as plt
+    frame = baseLayer.copy()
+    for status, color in FIRE_COLORS.items():
+        frame[statusGrid == status] = color
+    # origin='lower' keeps the orientation of the contour plot in the Tk window
+    plt.imsave(filename, frame, origin='lower')
+    return filename
+
+''' returns the path of the encoder used for animations (ffmpeg), None if it is not installed '''
+def findEncoder():
+    return shutil.which("ffmpeg")
+
+''' assembles the first frameCount frames into an animation using ffmpeg;
+    the output format is taken from the extension of outFile (.gif, .mp4, ...)
+    raises RuntimeError if ffmpeg fails '''
+def encodeAnimation(frameDir, outFile, fps, frameCount):
+    # ffmpeg reads numbered frames until one is missing, so stop it at the last frame of this run
+    cmd = [findEncoder(), "-y", "-loglevel", "error", "-framerate", str(fps),
+           "-i", os.path.join(frameDir, "frame_%04d.png"), "-frames:v", str(frameCount)]
+    if not outFile.endswith(".gif"):
+        # h264 needs even dimensions and yuv420p for most players
+        cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p"]
+    cmd.append(outFile)
+    if subprocess.run(cmd).returncode != 0:
+        raise RuntimeError(f"ffmpeg could not encode {outFile}; frames are in {frameDir}")
+
+''' runs the simulation for every hour of the weather forecast, rendering each hour
+    to frameDir/frame_NNNN.png in a process pool so rendering never blocks the simulation;
+    frame 0 is the initial fire. frames left in frameDir by an earlier export are removed first.
+    if animation is given and ffmpeg is installed, the frames are encoded into it.
+    returns the list of written frame filenames '''
+def exportSimulation(fireSim, elevationData, weather_forecast, frameDir,
+                     animation=None, fps=4, workers=None):
+    os.makedirs(frameDir, exist_ok=True)
+    for oldFrame in glob.glob(os.path.join(glob.escape(frameDir), "frame_[0-9][0-9][0-9][0-9].png")):
+        os.remove(oldFrame)
+    base = renderBaseLayer(elevationData)
+    futures = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(base,)) as pool:
+        def submit(hour):
+            filename = os.path.join(frameDir, f"frame_{hour:04d}.png")
+            futures.append(pool.submit(renderFrame, fireSim.fireStatusGrid(), filename))
+        submit(0)
+        for hour, hourly_weather in enumerate(weather_forecast, start=1):
+            fireSim.growFireFront(hourly_weather)
+            submit(hour)
+            if not fireSim.isBurning(): # fire has burned out
+                break
+        frames = [future.result() for future in futures]
+    if animation is not None and findEncoder() is not None:
+        encodeAnimation(frameDir, animation, fps, len(frames))
+    return frames
@@ -28,6 +28,8 @@ class Graphics:
         self.fireButton = None
         self.updateButton = None
         self.hours = 0
+        self.timeline = None
+        self.replay = None # image of a past hour's fire drawn over the live fire
 
     def start(self, wf):
         self.weather_forecast=wf
@@ -59,10 +61,11 @@ class Graphics:
     def growFire(self):
         try:
             for hour, hourly_weather in enumerate(self.weather_forecast, start=self.hours):
-                self.updateFire()
                 self.growFireFront(hourly_weather)
                 break
             self.hours+=1
+            self.timeline.configure(to=self.fire.hour)
+            self.timeline.set(self.fire.hour)
             self.updateButton["command"] = self.growFire
             self.tk.mainloop()
         except:
@@ -72,25 +75,31 @@ class Graphics:
             self.tk.mainloop()
 
     def growFireFront(self, weather):
+        self.fire.hour += 1
+        # the previous hour's fire burns for an hour before the front grows, as in Simulator.growFireFront
+        self.fire.burnFire()
+        self.updateFire()
         self.fire.setWindVector(weather.windSpeed, weather.windDirection)
         next_area = []
         next_area_points = {}  # use dictionary for O(1) lookups
         for curr_point in self.fire.firePerimeter:
             fire_points = self.fire.calcGrowthFromPoint(curr_point)
             for point in fire_points:
-                # if not already on fire and is outside of current perimeter
-                if next_area_points.get(point.key()) is None and not self.fire.fireBounds.contains_point((point.x, point.y)):
+                # draw every point ignited this hour, including those inside the current perimeter
+                if self.activeFire.get(point.key()) is None:
                     self.activeFire[point.key()] = point
-                    next_area_points[point.key()] = point  # add point to dictionary for curr iter
-                    next_area.append(point)
                     x, y = int(point.x), int(point.y)
                     c = plt.Circle((x, y), 1, color="red")
                     self.ax.add_patch(c)
-                    point.fire.burn()
+                # if not already on fire and is outside of current perimeter
+                if next_area_points.get(point.key()) is None and not self.fire.fireBounds.contains_point((point.x, point.y)):
+                    next_area_points[point.key()] = point  # add point to dictionary for curr iter
+                    next_area.append(point)
         self.canvas.get_tk_widget().update_idletasks()
         self.canvas.draw()
         self.fire.firePerimeter = convex_hull.get_perimeter(next_area)  # finds new perimeter from all local perimeters
         self.fire.updateFireBounds()
+        self.fire.endHour()
 
     def updateFire(self):
         for point in self.activeFire:
@@ -108,17 +117,41 @@ class Graphics:
                 x, y = int(point[0].split(", ")[0]), int(point[0].split(", ")[1])
                 c = plt.Circle((x, y), 1, color="red")
                 self.ax.add_patch(c)
-                status.fire.burn()
                 self.activeFire[point[0]] = status
         self.startTime = time.time()
         #self.fireButton["text"] = ""
         self.fireButton.destroy()
         self.activateHover()
+        self.timeline = Scale(self.tk, label="Hour", from_=0, to=0, orient=HORIZONTAL, command=self.showHour)
+        self.timeline.pack(side=BOTTOM, fill=X)
         self.canvas.get_tk_widget().update_idletasks()
         self.canvas.draw()
         self.clock()
         self.changeBtnTxt()
 
+    ''' replays the fire at the given hour from the simulator's history; the live fire is shown
+        again once the timeline is back at the current hour '''
+    def showHour(self, value):
+        hour = int(value)
+        if self.replay is not None:
+            self.replay.remove()
+            self.replay = None
+        live = hour >= self.fire.hour
+        for patch in self.ax.patches:
+            patch.set_visible(live)
+        if not live:
+            status = self.fire.history.statusAt(hour)
+            colors = np.zeros(status.shape + (4,))
+            colors[status == 2] = (1, 0, 0, 1) # active, red
+            colors[status == 3] = (0, 0, 0, 1) # burnt, black
+            y, x = status.shape
+            xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+            self.replay = self.ax.imshow(colors, origin="lower", extent=(-0.5, x - 0.5, -0.5, y - 0.5),
+                                         interpolation="nearest")
+            self.ax.set_xlim(xlim)
+            self.ax.set_ylim(ylim)
+        self.canvas.draw_idle()
+
     def activateHover(self):
         self.canvas.mpl_connect("motion_notify_event",
                 lambda event: self.hover(event))
@@ -128,14 +161,13 @@ class Graphics:
         if event.inaxes == self.ax:
             temp_str = str(int(event.xdata)) + ", " + str(int(event.ydata))
             if self.fire.fireArea.get(temp_str) is not None:
+                burnedArea = self.fire.burnedArea()
                 if self.hours > 1:
                     self.info.config(text="The fire area is currently {} meters^2 after {} hours of growth".format(
-                        len(self.fire.fireArea) * self.fire.xPointScale * self.fire.yPointScale,
-                        self.hours))
+                        burnedArea, self.hours))
                 else:
                     self.info.config(text="The fire area is currently {} meters^2 after {} hour of growth".format(
-                        len(self.fire.fireArea) * self.fire.xPointScale * self.fire.yPointScale,
-                        self.hours))
+                        burnedArea, self.hours))
             else:
                 self.info.config(text="")
 
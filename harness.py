@@ -0,0 +1,161 @@
+''' differential harness comparing simulation engines against the legacy perimeter engine;
+    runs every engine on the same synthetic and real DEM scenarios and writes a JSON report of
+    burned area IoU, perimeter Hausdorff distance and arrival time differences next to
+    each engine's wall time and peak memory
+
+    usage: python3 harness.py [--engines perimeter automaton] [--dem DEM.tif ...] [--output report.json]
+'''
+import argparse, json, sys, time, tracemalloc
+import numpy as np
+import automaton, engines, sim, weather # local modules
+
+REFERENCE_ENGINE = "perimeter"
+NEVER = sim.NEVER # arrival hour of cells that never caught fire
+
+''' synthetic elevation generators, each takes the map size and returns an elevation array in meters '''
+def flatDEM(size):
+    return np.full((size, size), 100, dtype=np.int16)
+def slopeDEM(size):
+    y, x = np.mgrid[0:size, 0:size]
+    return (100 + 2 * x).astype(np.int16) # rises 2m per cell towards the east
+def ridgeDEM(size):
+    y, x = np.mgrid[0:size, 0:size]
+    return (100 + 60 * np.exp(-((x - size / 2) / (size / 8)) ** 2)).astype(np.int16) # north-south ridge
+SYNTHETIC_DEMS = {"flat": flatDEM, "slope": slopeDEM, "ridge": ridgeDEM}
+
+''' returns an hourly forecast with constant wind, in the format of weather.getWeatherData '''
+def constantForecast(hours, windSpeed, windDirection):
+    return [weather.Weather(time=hour, temperature=70, windSpeed=windSpeed, windDirection=windDirection)
+            for hour in range(hours)]
+
+''' runs engine name on one scenario, returns the engine and its setup and simulation wall times '''
+def simulate(name, elevationData, dX, dY, start, forecast, stepsPerHour):
+    startTime = time.perf_counter()
+    fireSim = engines.createEngine(name, elevationData, dX, dY, stepsPerHour=stepsPerHour)
+    fireSim.startFire(*start)
+    setupTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    for hourly_weather in forecast:
+        fireSim.growFireFront(hourly_weather)
+    simulateTime = time.perf_counter() - startTime
+    return fireSim, setupTime, simulateTime
+
+''' runs engine name on one scenario, returns the burned mask of every hour,
+    the arrival hour of every cell and the engine's measurements; the peak memory comes from
+    a second run since tracemalloc slows down every allocation of the timed run '''
+def runEngine(name, elevationData, dX, dY, start, forecast, stepsPerHour):
+    fireSim, setupTime, simulateTime = simulate(name, elevationData, dX, dY, start, forecast, stepsPerHour)
+    tracemalloc.start()
+    simulate(name, elevationData, dX, dY, start, forecast, stepsPerHour)
+    _, peakMemory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    arrival = fireSim.history.ignitionHour.reshape(elevationData.shape) # drops the automaton's scenario axis
+    burnedMasks = [arrival <= hour for hour in range(len(forecast) + 1)]
+    measurements = {
+        "setupSeconds": setupTime,
+        "simulateSeconds": simulateTime,
+        "peakMemoryBytes": peakMemory,
+        "burnedCells": int(burnedMasks[-1].sum()),
+    }
+    return burnedMasks, arrival, measurements
+
+''' returns the intersection over union of two burned masks '''
+def intersectionOverUnion(a, b):
+    union = np.logical_or(a, b).sum()
+    if union == 0:
+        return 1.0
+    return float(np.logical_and(a, b).sum() / union)
+
+''' returns the directed Hausdorff distance (meters) from the points of a to the points of b '''
+def directedHausdorff(a, b, dX, dY, chunk=1024):
+    scale = np.array([dY, dX], dtype=np.float64)
+    a, b = a * scale, b * scale
+    furthest = 0.0
+    for i in range(0, len(a), chunk):
+        diff = a[i:i + chunk, None, :] - b[None, :, :]
+        nearest = np.sqrt((diff * diff).sum(axis=2)).min(axis=1)
+        furthest = max(furthest, float(nearest.max()))
+    return furthest
+
+''' returns the Hausdorff distance (meters) between the perimeters of two burned masks,
+    None if only one of them has burned '''
+def hausdorffDistance(a, b, dX, dY):
+    pa, pb = np.argwhere(sim.perimeterMask(a)), np.argwhere(sim.perimeterMask(b))
+    if len(pa) == 0 or len(pb) == 0:
+        return 0.0 if len(pa) == len(pb) else None
+    return max(directedHausdorff(pa, pb, dX, dY), directedHausdorff(pb, pa, dX, dY))
+
+''' compares a candidate engine's results to the reference engine's '''
+def compareRuns(reference, candidate, dX, dY):
+    refMasks, refArrival = reference
+    masks, arrival = candidate
+    inBoth = (refArrival != NEVER) & (arrival != NEVER)
+    arrivalDiff = np.abs(arrival[inBoth].astype(np.int32) - refArrival[inBoth])
+    return {
+        "iou": [intersectionOverUnion(a, b) for a, b in zip(refMasks, masks)],
+        "hausdorffMeters": [hausdorffDistance(a, b, dX, dY) for a, b in zip(refMasks, masks)],
+        "arrivalHours": {
+            "meanAbsDiff": float(arrivalDiff.mean()) if arrivalDiff.size else 0.0,
+            "maxAbsDiff": int(arrivalDiff.max()) if arrivalDiff.size else 0,
+            "onlyReferenceCells": int(((refArrival != NEVER) & (arrival == NEVER)).sum()),
+            "onlyCandidateCells": int(((refArrival == NEVER) & (arrival != NEVER)).sum()),
+        },
+    }
+
+''' runs every engine on a scenario and compares each to the reference engine,
+    returns the scenario's report entry '''
+def runScenario(name, elevationData, dX, dY, start, forecast, engineNames, stepsPerHour):
+    report = {"name": name, "shape": list(elevationData.shape), "scale": [dX, dY],
+              "start": list(start), "hours": len(forecast), "engines": {}, "comparisons": {}}
+    results = {}
+    for engine in [REFERENCE_ENGINE] + [e for e in engineNames if e != REFERENCE_ENGINE]:
+        masks, arrival, measurements = runEngine(engine, elevationData, dX, dY, start, forecast, stepsPerHour)
+        results[engine] = (masks, arrival)
+        report["engines"][engine] = measurements
+        if engine != REFERENCE_ENGINE:
+            report["comparisons"][engine] = compareRuns(results[REFERENCE_ENGINE], results[engine], dX, dY)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="compare WildfireSim engines against the " +
+                                                 f"{REFERENCE_ENGINE} engine")
+    parser.add_argument("--engines", nargs="+", default=engines.ENGINES, choices=engines.ENGINES)
+    parser.add_argument("--dem", nargs="*", default=[], help="real DEM.tif files to include")
+    parser.add_argument("--size", type=int, default=100, help="size of the synthetic DEMs in cells")
+    parser.add_argument("--scale", type=float, default=10.0, help="meters per synthetic DEM cell")
+    parser.add_argument("--hours", type=int, default=6)
+    parser.add_argument("--wind", type=float, nargs=2, default=[5.0, 45.0], metavar=("MPH", "DIRECTION"))
+    parser.add_argument("--start", type=float, nargs=3, default=[0.5, 0.5, 30],
+                        metavar=("XPERCENT", "YPERCENT", "RADIUS"))
+    parser.add_argument("--steps", type=int, default=automaton.STEPS_PER_HOUR,
+                        help="minimum automaton timesteps per hour")
+    parser.add_argument("--output", help="report file, defaults to stdout")
+    args = parser.parse_args()
+
+    forecast = constantForecast(args.hours, *args.wind)
+    start = (args.start[0], args.start[1], int(args.start[2]))
+    scenarios = [(name, generate(args.size), args.scale, args.scale)
+                 for name, generate in SYNTHETIC_DEMS.items()]
+    if args.dem:
+        import elevation # local module, needs gdal
+        for mapFile in args.dem:
+            dX, dY, elevationData = elevation.getElevationData(mapFile)
+            scenarios.append((mapFile, elevationData, dX, dY))
+
+    sim.getPathClass() # import matplotlib up front, otherwise the first scenario's setup time includes it
+    report = {"reference": REFERENCE_ENGINE, "scenarios": []}
+    for name, elevationData, dX, dY in scenarios:
+        print(f"harness: running {name}", file=sys.stderr)
+        report["scenarios"].append(runScenario(name, elevationData, dX, dY, start, forecast,
+                                                   args.engines, args.steps))
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
-import elevation, weather, sim, convex_hull# local modules
-import sys, os
-import numpy as np
-from graphics import Graphics
+import elevation, weather, engines # local modules
+import sys, os, time, importlib
+from concurrent.futures import ThreadPoolExecutor
 
 def printError(msg):
     print("WildfireSim: " + msg, file=sys.stderr)
@@ -22,8 +21,8 @@ def printProgressBar (iteration, total, fill='█', printEnd="\r"):
     if iteration == total: 
         print()
 
-''' retrieves weather data from weather module and handles all errors '''
-def getWeatherData(latStr, lonStr):
+''' checks the API access key and location of the weather request, returns apikey, latitude, longitude '''
+def getWeatherRequest(latStr, lonStr):
     # get environment variable
     apikey = os.getenv('WEATHER_ACCESS')
     if apikey is None:
@@ -33,17 +32,21 @@ def getWeatherData(latStr, lonStr):
     try:
         lat = float(latStr)
         lon = float(lonStr)
-        weather_data = weather.getWeatherData(apikey, lat, lon)
-    except weather.WeatherAPIError as e:
-        printError(e.message)
-        sys.exit(1)
     except ValueError:
         printError("latitude and longitude must be of type float")
         sys.exit(1)
-    return weather_data
+    return apikey, lat, lon
 
-''' retrieves elevation data from module, converts to map data and handles all errors 
-    returns np array of map'''
+''' retrieves weather data from weather module and handles all errors '''
+def getWeatherData(apikey, lat, lon):
+    try:
+        return weather.getWeatherData(apikey, lat, lon)
+    except weather.WeatherAPIError as e:
+        printError(e.message)
+        sys.exit(1)
+
+''' retrieves elevation data from module and handles all errors 
+    returns the map scales and np array of elevations'''
 def getMapData(mapFile):
     ''' get elevation data '''
     try:
@@ -57,21 +60,15 @@ def getMapData(mapFile):
     if elevation_data is None:
         printError(f"{mapFile}: could not open image file")
         sys.exit(1)
+    return dX, dY, elevation_data
 
-    y, x = elevation_data.shape
-    ''' convert elevation data into map data '''
-    mapPoints = []
-    printProgressBar(0, y)
-    for i_y in range(0, y):
-        line = []
-        for i_x in range(0, x):
-            point = sim.MapPoint(elevation_data[i_y, i_x], i_x, i_y)
-            line.append(point)
-        mapPoints.append(line)
-        printProgressBar(i_y + 1, y)
-
-    # TODO: temporarily returns elevation_data (for matplot)
-    return np.asarray(mapPoints), dX, dY, elevation_data
+''' creates the chosen simulation engine for the elevation data and handles all errors '''
+def getSimulator(engine, elevation_data, dX, dY):
+    try:
+        return engines.createEngine(engine, elevation_data, dX, dY, progress=printProgressBar)
+    except ValueError as e:
+        printError(str(e))
+        sys.exit(1)
 
 ''' formats the fire starting location and its size '''
 def getFireStart(xStr, yStr, rStr):
@@ -87,18 +84,93 @@ def getFireStart(xStr, yStr, rStr):
         sys.exit(1)
     return xPercent, yPercent, radius
 
+''' creates the chosen simulation engine and starts the fire '''
+def startSimulator(engine, elevation_data, dX, dY, xPercent, yPercent, radius):
+    fireSim = getSimulator(engine, elevation_data, dX, dY)
+    fireSim.startFire(xPercent, yPercent, radius)
+    return fireSim
+
+''' runs func(*args) and records its wall time in seconds under stage in timings '''
+def timeStage(timings, stage, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+''' prints the wall time of every startup stage '''
+def printTimings(timings):
+    stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+    print(f"WildfireSim: startup: {stages}")
+
+''' parses the optional flags following the positional arguments, returns dictionary of options '''
+def getOptions(args):
+    options = {"export": None, "animation": None, "engine": engines.ENGINES[0]}
+    i = 0
+    while i < len(args):
+        flag = args[i].lstrip("-")
+        if flag not in options or i + 1 >= len(args):
+            printError(f"unknown option or missing value: {args[i]}")
+            sys.exit(1)
+        options[flag] = args[i + 1]
+        i += 2
+    return options
+
+''' renders every simulated hour to PNG frames in frameDir, and to an animation if requested '''
+def exportFire(fireSim, elevation_data, weather_forecast, frameDir, animation):
+    import export # local module, only needed when exporting
+    if animation is not None and export.findEncoder() is None:
+        printError(f"ffmpeg not found, skipping {animation}; only writing frames")
+        animation = None
+    try:
+        frames = export.exportSimulation(fireSim, elevation_data, weather_forecast, frameDir, animation)
+    except RuntimeError as e:
+        printError(str(e))
+        sys.exit(1)
+    print(f"WildfireSim: wrote {len(frames)} frames to {frameDir}")
+    if animation is not None:
+        print(f"WildfireSim: wrote animation to {animation}")
+
 def main():
     if len(sys.argv) < 7:
-        print("usage: python3 main.py DEM.tif latitude longitude, xPercent, yPercent, size")
+        print("usage: python3 main.py DEM.tif latitude longitude, xPercent, yPercent, size " + \
+              "[--export frameDir] [--animation out.gif|out.mp4] [--engine " + "|".join(engines.ENGINES) + "]")
         print("\twhere xPercent, yPercent = 0.0-1.0 representing the location of fire start on map")
         print("\tand size is size of fire's radius in meters")
+        print("\t--export renders each simulated hour to PNG frames instead of opening the window,")
+        print("\t--animation additionally encodes the frames with ffmpeg")
+        print("\t--engine selects the simulation engine, the automaton engine requires --export")
+        sys.exit(1)
+    options = getOptions(sys.argv[7:])
+    if options["animation"] is not None and options["export"] is None:
+        printError("--animation requires --export")
+        sys.exit(1)
+    if options["engine"] != "perimeter" and options["export"] is None:
+        printError(f"the {options['engine']} engine can only be used with --export")
         sys.exit(1)
     xPercent, yPercent, radius = getFireStart(sys.argv[4], sys.argv[5], sys.argv[6])
-    weather_forecast = getWeatherData(sys.argv[2], sys.argv[3])
-    mapPoints, dX, dY, elevation_data = getMapData(sys.argv[1]) # TODO: remove elevation_data
+    # checked before starting the pool, whose errors only surface once the DEM is loaded
+    apikey, lat, lon = getWeatherRequest(sys.argv[2], sys.argv[3])
 
-    fireSim = sim.Simulator(mapPoints, dX, dY)
-    fireSim.startFire(xPercent, yPercent, radius)
+    # the weather fetch (network) overlaps with loading the DEM and precomputing the simulator,
+    # and the live window's imports load in the background while both run
+    timings = {}
+    startTime = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        weatherFuture = pool.submit(timeStage, timings, "weather", getWeatherData, apikey, lat, lon)
+        if options["export"] is None:
+            pool.submit(timeStage, timings, "graphics imports", importlib.import_module, "graphics")
+        dX, dY, elevation_data = timeStage(timings, "dem", getMapData, sys.argv[1])
+        fireSim = timeStage(timings, "precompute", startSimulator, options["engine"], elevation_data, dX, dY,
+                            xPercent, yPercent, radius)
+        weather_forecast = weatherFuture.result()
+    timings["total"] = time.perf_counter() - startTime
+    printTimings(timings)
+
+    if options["export"] is not None:
+        exportFire(fireSim, elevation_data, weather_forecast, options["export"], options["animation"])
+        return
+    from graphics import Graphics # tkinter is only needed for the live window
     graph = Graphics(elevation_data)
     graph.fire = fireSim
     graph.start(weather_forecast)
@@ -3,7 +3,18 @@ import numpy as np
 import enum
 import random # temporary
 import math
-from matplotlib.path import Path
+
+ELEVATION_BAND = 100 # meters of elevation per band in FireStatistics
+NEVER = np.iinfo(np.uint16).max # FireHistory hour of points that never ignited or burnt out
+
+_pathClass = None # matplotlib.path.Path once loaded
+''' returns matplotlib's Path class; matplotlib is only loaded once a fire is simulated '''
+def getPathClass():
+    global _pathClass
+    if _pathClass is None:
+        from matplotlib.path import Path
+        _pathClass = Path
+    return _pathClass
 
 ''' represents a single point on map; includes all data necessary (excluding weather) 
     needed for fire growth calculations, and all data needed for graphics driver '''
@@ -82,6 +93,17 @@ class FirePoint:
     def effectiveHeatingNumber(self):
         return math.exp(-138/self.SAV())
     
+    ''' returns the time in hours the fuel type burns for once ignited '''
+    def burnTime(self):
+        if self.fuelType == 1:
+            return 1
+        elif self.fuelType == 2:
+            return 10
+        elif self.fuelType == 3:
+            return 100
+        elif self.fuelType == 4:
+            return 1000
+
     ''' changes fireStatus from unburnt to active and sets the timeRemaining
         to be the correct time given the fuel type '''
     def ignite(self):
@@ -89,14 +111,7 @@ class FirePoint:
         if self.fireStatus != FireStatus.unburnt:
             return
         self.fireStatus = FireStatus.active
-        if self.fuelType == 1:
-            self.timeRemaining = 1 
-        elif self.fuelType == 2:
-            self.timeRemaining = 10
-        elif self.fuelType == 3:
-            self.timeRemaining = 100
-        elif self.fuelType == 4:
-            self.timeRemaining = 1000
+        self.timeRemaining = self.burnTime()
     
     ''' decrements the time remaining by one hour, changes fireStatus to burnt 
         if timeRemaining reaches zero '''
@@ -110,6 +125,94 @@ class FireStatus(enum.Enum):
     active = 2
     burnt = 3     
 
+''' running statistics of a fire; updated as points ignite and burn out so that
+    reading them never depends on the size of the fire '''
+class FireStatistics:
+    def __init__(self, cellArea, elevationBand=ELEVATION_BAND):
+        self.cellArea = cellArea # square meters covered by one point on map
+        self.elevationBand = elevationBand # meters of elevation grouped into one band
+        self.hour = 0
+        self.burnedCells = 0 # points that have caught fire, burning or burnt
+        self.activeCells = 0 # points that are currently burning
+        self.perimeterLength = 0.0 # meters, length of the current fire perimeter
+        self.maxRateOfSpread = 0.0 # meters / hour, fastest rate of spread calculated so far
+        self.hourlyGrowth = [] # square meters burned during each hour
+        self.cellsByElevation = {} # lowest elevation of band -> burned points in band
+        self.cellsByFuel = {} # fuel type -> burned points of fuel type
+        self.hourStartCells = 0
+    def __repr__(self):
+        return self.__str__()
+    def __str__(self):
+        return f"hour: {self.hour}, burned: {self.burnedCells * self.cellArea}m^2, " + \
+               f"active points: {self.activeCells}, perimeter: {self.perimeterLength:.1f}m"
+
+    def ignited(self, point):
+        self.burnedCells += 1
+        self.activeCells += 1
+        band = int(point.elevation) // self.elevationBand * self.elevationBand
+        self.cellsByElevation[band] = self.cellsByElevation.get(band, 0) + 1
+        fuel = int(point.fire.fuelType)
+        self.cellsByFuel[fuel] = self.cellsByFuel.get(fuel, 0) + 1
+    def burntOut(self):
+        self.activeCells -= 1
+    def spread(self, rate):
+        if rate > self.maxRateOfSpread:
+            self.maxRateOfSpread = float(rate)
+    def endHour(self, perimeterLength):
+        self.hour += 1
+        self.hourlyGrowth.append((self.burnedCells - self.hourStartCells) * self.cellArea)
+        self.hourStartCells = self.burnedCells
+        self.perimeterLength = perimeterLength
+
+    ''' returns the area burned so far in square meters '''
+    def burnedArea(self):
+        return self.burnedCells * self.cellArea
+    ''' returns a copy of the statistics as a dictionary; areas are in square meters,
+        growthRate is the area burned during the last hour '''
+    def snapshot(self):
+        return {
+            "hour": self.hour,
+            "burnedArea": self.burnedArea(),
+            "activeCells": self.activeCells,
+            "perimeterLength": self.perimeterLength,
+            "growthRate": self.hourlyGrowth[-1] if self.hourlyGrowth else 0.0,
+            "hourlyGrowth": list(self.hourlyGrowth),
+            "maxRateOfSpread": self.maxRateOfSpread,
+            "burnedAreaByElevation": {band: cells * self.cellArea for band, cells in self.cellsByElevation.items()},
+            "burnedAreaByFuel": {fuel: cells * self.cellArea for fuel, cells in self.cellsByFuel.items()},
+        }
+
+''' run history of a fire, kept as two rasters holding the hour each point ignited and the hour
+    it burnt out (NEVER if it has not); hour 0 is the starting fire and hour h is the state after
+    h hours of growth. any hour's state is a threshold of the rasters, so the whole run can be
+    replayed without keeping per-hour snapshots. rasters may carry leading axes (e.g scenarios) '''
+class FireHistory:
+    def __init__(self, shape):
+        self.ignitionHour = np.full(shape, NEVER, dtype=np.uint16)
+        self.burnoutHour = np.full(shape, NEVER, dtype=np.uint16)
+    def __repr__(self):
+        return self.__str__()
+    def __str__(self):
+        return f"shape: {self.ignitionHour.shape}, hours: {self.lastHour()}"
+
+    ''' returns the last hour in which any point ignited or burnt out '''
+    def lastHour(self):
+        hours = np.concatenate([self.ignitionHour[self.ignitionHour != NEVER],
+                                self.burnoutHour[self.burnoutHour != NEVER]])
+        return int(hours.max()) if hours.size else 0
+
+    ''' returns a bool array of the points that had caught fire by the given hour '''
+    def burnedAt(self, hour):
+        return self.ignitionHour <= hour
+    ''' returns the fire status of every point at the given hour as a uint8 array of FireStatus values '''
+    def statusAt(self, hour):
+        return np.where(self.burnoutHour <= hour, np.uint8(FireStatus.burnt.value),
+                        np.where(self.ignitionHour <= hour, np.uint8(FireStatus.active.value),
+                                 np.uint8(FireStatus.unburnt.value)))
+    ''' returns a bool array of the points on the perimeter of the fire at the given hour '''
+    def perimeterAt(self, hour):
+        return perimeterMask(self.burnedAt(hour))
+
 class Simulator:
     def __init__(self, mapPoints, xScale, yScale):
         self.map = mapPoints
@@ -122,6 +225,11 @@ class Simulator:
         self.firePerimeter = [] 
         self.fireBounds = None
         self.fireArea = {} # all points that have caught fire, dictionary for lookup performance
+        self.activeFire = {} # points that are currently burning, subset of fireArea
+        self.statistics = FireStatistics(xScale * yScale)
+        self.hourlyCallbacks = [] # called with a statistics snapshot at the end of each hour
+        self.hour = 0 # hour being simulated, 0 while starting the fire
+        self.history = FireHistory(mapPoints.shape)
     def __repr__(self):
         return self.__str__()
     def __str__(self):
@@ -158,68 +266,98 @@ class Simulator:
         bounds = []
         for point in self.firePerimeter:
             bounds.append((point.x, point.y))
-        self.fireBounds = Path(bounds, closed=True)
+        self.fireBounds = getPathClass()(bounds, closed=True)
+
+    ''' ignites an unburnt point and records it in fireArea and activeFire '''
+    def ignitePoint(self, point):
+        if point.fire.fireStatus != FireStatus.unburnt:
+            return
+        point.fire.ignite()
+        self.fireArea[point.key()] = point
+        self.activeFire[point.key()] = point
+        self.history.ignitionHour[point.y, point.x] = self.hour
+        self.statistics.ignited(point)
+    ''' burns an active point for one hour, removing it from activeFire once it has burnt out '''
+    def burnPoint(self, point):
+        if point.fire.fireStatus != FireStatus.active:
+            return
+        point.fire.burn()
+        if point.fire.fireStatus == FireStatus.burnt:
+            self.activeFire.pop(point.key(), None)
+            self.history.burnoutHour[point.y, point.x] = self.hour
+            self.statistics.burntOut()
+    ''' burns every active point for one hour '''
+    def burnFire(self):
+        for point in list(self.activeFire.values()):
+            self.burnPoint(point)
+    ''' returns the length of the current fire perimeter in meters '''
+    def perimeterLength(self):
+        length = 0.0
+        for i, point in enumerate(self.firePerimeter):
+            length += self.distanceBetweenPoints(self.firePerimeter[i - 1], point)
+        return length
+    ''' registers callback(snapshot) to be called with the fire statistics at the end of each hour '''
+    def addHourlyCallback(self, callback):
+        self.hourlyCallbacks.append(callback)
+    ''' returns a snapshot of the fire statistics, see FireStatistics.snapshot '''
+    def getStatistics(self):
+        return self.statistics.snapshot()
+    ''' returns the area burned so far in square meters, without copying the statistics '''
+    def burnedArea(self):
+        return self.statistics.burnedArea()
+    ''' closes the current hour's statistics and notifies the hourly callbacks '''
+    def endHour(self):
+        self.statistics.endHour(self.perimeterLength())
+        if self.hourlyCallbacks:
+            snapshot = self.getStatistics()
+            for callback in self.hourlyCallbacks:
+                callback(snapshot)
+    ''' returns True while any point on map is still burning '''
+    def isBurning(self):
+        return len(self.activeFire) > 0
+    ''' returns the fire status of every point on map as a uint8 array of FireStatus values '''
+    def fireStatusGrid(self):
+        return self.history.statusAt(self.hour)
 
     ''' starts a fire with radius of size size (meters) at dX, dY position as a percentage on map '''
     def startFire(self, xPercent, yPercent, size):
-        xPos = int(self.xBoundary * xPercent)
-        yPos = int(self.yBoundary * yPercent)
-
-        xStart = xPos - self.xMetersToPoints(size)
-        xEnd = xPos + self.xMetersToPoints(size)
-        yStart = yPos - self.yMetersToPoints(size)
-        yEnd = yPos + self.yMetersToPoints(size)
-        
-        # ensure boundaries are accounted for
-        xStart = 0 if xStart < 0 else int(xStart)
-        xEnd = self.xBoundary if xEnd > self.xBoundary else int(xEnd)
-        yStart = 0 if yStart < 0 else int(yStart)
-        yEnd = self.yBoundary if yEnd > self.yBoundary else int(yEnd)
-
+        xStart, xEnd, yStart, yEnd = getFireStartBounds(self.xBoundary, self.yBoundary,
+                                        self.xPointScale, self.yPointScale, xPercent, yPercent, size)
         bounds = []
         # ignite each point in calculated region and add to active fire queue
         for y in range(yStart, yEnd):
             for x in range(xStart, xEnd):
                 point = self.map[y, x]
-                point.fire.ignite() # TODO: add graphics update here
+                self.ignitePoint(point) # TODO: add graphics update here
                 bounds.append(point)
-                if self.fireArea.get(point.key()) is None:
-                    self.fireArea[point.key()] = point
+        self.statistics.hourStartCells = self.statistics.burnedCells # the starting fire is not growth
         self.firePerimeter = convex_hull.get_perimeter(bounds)
         self.updateFireBounds()
 
     ''' returns Rothermel's slope factor for surface fire spread. S = 5.275 * P^(-0.3)*(tanTheta)^2 '''
     def slopeFactor(self, p1, p2): # guarenteed to be different p1 and p2
-        packingRatio = p1.fire.packingRatio()
         # tan theta = dY / dX, where dY is change in elevation, dX is distance between points
         tanTheta = (p2.elevation - p1.elevation) / self.distanceBetweenPoints(p1, p2)
-        return 5.275 * (packingRatio ** -0.3) * (tanTheta * tanTheta) # Rothermel's slope factor
+        return rothermelSlopeFactor(p1.fire.packingRatio(), tanTheta)
 
     ''' returns Rothermel's wind factor for surface fire spread 
         note: Rothermel's model goes into great depth on calculating the effective flamespeed given
         several more environmental factors, so this approach is simplified. '''
     def windFactor(self, p1, p2): # guarenteed to be different p1 and p2
-        sv = p1.fire.SAV()
-        C = 7.47 * math.exp(-0.133 * (sv ** 0.55))
-        B = 0.02526 * (sv ** 0.54)
-        E = -1 * (0.715 * math.exp(-3.59 * 0.0001 * sv))
-
         # calculate wind speed in given direction of two points
         v = self.vectorize(p1, p2)
         vectorScalar = self.windVector.dot(v) / v.dot(v) # (u dot v / v dot v) v
         localWindVector = v * vectorScalar
         localWindSpeed = np.sqrt(localWindVector.dot(localWindVector)) # vector's magnitude
-        res = C * (localWindSpeed ** B) * (p1.fire.relativePackingRatio() ** E) # Rothermel's wind factor (units are feet/min)
+        res = rothermelWindFactor(p1.fire.SAV(), p1.fire.relativePackingRatio(), localWindSpeed)
         return 0 if vectorScalar < 0 else res # disregard windfactor if it is in hurting direction
 
     ''' returns Rothermel's propagating flux ratio '''
     def propagatingFlux(self, point):
-        sv = point.fire.SAV()
-        p = point.fire.packingRatio()
-        return ((192 + 0.2595 * sv) ** -1) * (math.exp((0.792 + 0.681 * (sv ** 0.5)) * (p * 0.1)))
+        return rothermelPropagatingFlux(point.fire.SAV(), point.fire.packingRatio())
     
     def reactionIntensity(self):
-        return 3000 # was common reaction intensity given 0.20-0.30 packing ratio
+        return REACTION_INTENSITY
         
     ''' returns entire numerator to Rothermel's fire spread calculation '''
     def heatSource(self, p1, p2):
@@ -228,14 +366,13 @@ class Simulator:
     ''' returns entire denominator to Rothermel's fire spread calculation 
         input is the point in prospect to catch fire '''
     def heatSink(self, point):
-        Q = 250 + 1116 * point.fire.fuelMoisture() # heat of preignition
-        return point.fire.bulkDensity() * point.fire.effectiveHeatingNumber() * Q
+        return rothermelHeatSink(point.fire.bulkDensity(), point.fire.effectiveHeatingNumber(),
+                                 point.fire.fuelMoisture())
     
     ''' returns the rate of spread (in meters / hours) for fire in the direction of p1 -> p2 '''
     def rateOfSpread(self, p1, p2):
         rate = self.heatSource(p1, p2) / self.heatSink(p2)
-        # convert rate from feet/min to meters/hr
-        return rate * 60 / 3.28084
+        return rate * FEET_PER_MIN_TO_METERS_PER_HOUR
 
     ''' given a single point, calculates all the points around it that the fire will spread to;
         excludes points that are already burnt,
@@ -260,6 +397,7 @@ class Simulator:
             wRate = self.rateOfSpread(point, self.map[point.y, point.x-1])
         if point.x + 1 < self.xBoundary:
             eRate = self.rateOfSpread(point, self.map[point.y, point.x+1])
+        self.statistics.spread(max(nRate, neRate, eRate, seRate, sRate, swRate, wRate, nwRate))
         
         # calculate coordinates for perimeter points
         # North
@@ -312,7 +450,7 @@ class Simulator:
 
         fireBoundary = [(nX, nY), (neX, neY), (eX, eY), (seX, seY), 
                         (sX, sY), (swX, swY), (wX, wY), (nwX, nwY)]
-        fire = Path(fireBoundary, closed=True)
+        fire = getPathClass()(fireBoundary, closed=True)
 
         # calculate rectangle overlay of fire polygon; narrows points to parse through
         minY = min(nwY, nY, neY) # most northern point
@@ -328,16 +466,16 @@ class Simulator:
                 # if point is in bounds of spread and is not already burnt, ignite and add to points
                 if fire.contains_point(p) and point.fire.fireStatus != FireStatus.burnt:
                     points.append(point)
-                    # add point to fireArea if not alread in it
-                    if self.fireArea.get(point.key()) is None:
-                        self.fireArea[point.key()] = point
-                    point.fire.ignite() # ignite fire if not already burnt # TODO: add graphics update here
+                    self.ignitePoint(point) # ignite fire if not already burning # TODO: add graphics update here
         return points
     
     ''' runs single iteration of fire growth, equivalent to one hour of growth;
         works by iterating through every point in the active fire front (firePerimeter),
-        and creating a new queue for next iteration of fireFront'''
+        and creating a new queue for next iteration of fireFront;
+        points ignited in the previous hour burn for an hour before the front grows '''
     def growFireFront(self, weather):
+        self.hour += 1
+        self.burnFire()
         self.setWindVector(weather.windSpeed, weather.windDirection)
         next_area = []
         next_area_points = {} # use dictionary for O(1) lookups
@@ -348,8 +486,12 @@ class Simulator:
                 if next_area_points.get(point.key()) is None and not self.fireBounds.contains_point((point.x, point.y)):
                     next_area_points[point.key()] = point # add point to dictionary for curr iter
                     next_area.append(point)
-        self.firePerimeter = convex_hull.get_perimeter(next_area) # finds new perimeter from all local perimeters
-        self.updateFireBounds()
+        if len(next_area) == 0: # fire has stopped spreading
+            self.firePerimeter = []
+        else:
+            self.firePerimeter = convex_hull.get_perimeter(next_area) # finds new perimeter from all local perimeters
+            self.updateFireBounds()
+        self.endHour()
 
     ''' TODO: no longer used '''
     ''' runs single iteration of fire growth, equivalent to one hour of growth;
@@ -382,6 +524,74 @@ class Simulator:
         # next_iteration becomes new firePerimeter
         self.firePerimeter = convex_hull.get_perimeter(next_iteration)
 
+''' returns a bool array of the burned points that border an unburnt point or the map edge,
+    along the last two axes of the burned array '''
+def perimeterMask(burned):
+    pad = [(0, 0)] * (burned.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(burned, pad, constant_values=False)
+    interior = padded[..., :-2, 1:-1] & padded[..., 2:, 1:-1] & padded[..., 1:-1, :-2] & padded[..., 1:-1, 2:]
+    return burned & ~interior
+
+''' creates the 2D array of MapPoints for the elevation data,
+    progress(iteration, total) is called after each row if given '''
+def createMapPoints(elevationData, progress=None):
+    y, x = elevationData.shape
+    mapPoints = []
+    if progress is not None:
+        progress(0, y)
+    for i_y in range(0, y):
+        line = []
+        for i_x in range(0, x):
+            point = MapPoint(elevationData[i_y, i_x], i_x, i_y)
+            line.append(point)
+        mapPoints.append(line)
+        if progress is not None:
+            progress(i_y + 1, y)
+    return np.asarray(mapPoints)
+
+''' returns the (xStart, xEnd, yStart, yEnd) map indices of a fire with radius of size size (meters)
+    started at xPercent, yPercent position on a map of the given boundaries and scales '''
+def getFireStartBounds(xBoundary, yBoundary, xScale, yScale, xPercent, yPercent, size):
+    xPos = int(xBoundary * xPercent)
+    yPos = int(yBoundary * yPercent)
+
+    xStart = xPos - size // xScale
+    xEnd = xPos + size // xScale
+    yStart = yPos - size // yScale
+    yEnd = yPos + size // yScale
+
+    # ensure boundaries are accounted for
+    xStart = 0 if xStart < 0 else int(xStart)
+    xEnd = xBoundary if xEnd > xBoundary else int(xEnd)
+    yStart = 0 if yStart < 0 else int(yStart)
+    yEnd = yBoundary if yEnd > yBoundary else int(yEnd)
+    return xStart, xEnd, yStart, yEnd
+
+''' Rothermel's surface fire spread terms; written with numpy so they apply equally
+    to single points (Simulator) and whole arrays of points (automaton engine) '''
+REACTION_INTENSITY = 3000 # was common reaction intensity given 0.20-0.30 packing ratio
+FEET_PER_MIN_TO_METERS_PER_HOUR = 60 / 3.28084
+
+''' returns Rothermel's slope factor. S = 5.275 * P^(-0.3)*(tanTheta)^2 '''
+def rothermelSlopeFactor(packingRatio, tanTheta):
+    return 5.275 * (packingRatio ** -0.3) * (tanTheta * tanTheta)
+
+''' returns Rothermel's wind factor given the wind speed (feet/min) in the direction of spread '''
+def rothermelWindFactor(sav, relativePackingRatio, windSpeed):
+    C = 7.47 * np.exp(-0.133 * (sav ** 0.55))
+    B = 0.02526 * (sav ** 0.54)
+    E = -1 * (0.715 * np.exp(-3.59 * 0.0001 * sav))
+    return C * (windSpeed ** B) * (relativePackingRatio ** E)
+
+''' returns Rothermel's propagating flux ratio '''
+def rothermelPropagatingFlux(sav, packingRatio):
+    return ((192 + 0.2595 * sav) ** -1) * (np.exp((0.792 + 0.681 * (sav ** 0.5)) * (packingRatio * 0.1)))
+
+''' returns the denominator to Rothermel's fire spread calculation for the fuel in prospect to catch fire '''
+def rothermelHeatSink(bulkDensity, effectiveHeatingNumber, fuelMoisture):
+    Q = 250 + 1116 * fuelMoisture # heat of preignition
+    return bulkDensity * effectiveHeatingNumber * Q
+
 ''' gets the wind vector as a numpy vector given wind speed and direction '''
 def calculateWindVector(speed, direction):
     x, y = calculateVectorComponents(speed, direction)
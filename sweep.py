@@ -0,0 +1,43 @@
+''' parameter sweep of one ignition over every combination of wind speed, wind direction and
+    fuel moisture; all scenarios advance together in the automaton engine and the burned mask
+    of each scenario is written to a .npz file
+
+    usage: python3 sweep.py DEM.tif xPercent yPercent size hours --speeds 5 10 --directions 0 90
+                            [--moistures 0.2 0.4] --output sweep.npz
+'''
+import argparse, itertools, sys
+import numpy as np
+import automaton # local module
+
+def main():
+    parser = argparse.ArgumentParser(description="run a batched WildfireSim parameter sweep")
+    parser.add_argument("dem")
+    parser.add_argument("xPercent", type=float)
+    parser.add_argument("yPercent", type=float)
+    parser.add_argument("size", type=int, help="fire's radius in meters")
+    parser.add_argument("hours", type=int)
+    parser.add_argument("--speeds", type=float, nargs="+", required=True, help="wind speeds in mph")
+    parser.add_argument("--directions", type=float, nargs="+", required=True, help="wind directions")
+    parser.add_argument("--moistures", type=float, nargs="+", default=[None],
+                        help="fuel moistures, defaults to the fuel's own moisture")
+    parser.add_argument("--steps", type=int, default=automaton.STEPS_PER_HOUR, help="minimum automaton timesteps per hour")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    import elevation # local module, needs gdal
+    try:
+        dX, dY, elevationData = elevation.getElevationData(args.dem)
+    except (FileNotFoundError, elevation.FileNotSupportedError) as e:
+        print(f"WildfireSim: {args.dem}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    scenarios = list(itertools.product(args.speeds, args.directions, args.moistures))
+    speeds, directions, moistures = (list(values) for values in zip(*scenarios))
+    masks = automaton.runSweep(elevationData, dX, dY, (args.xPercent, args.yPercent, args.size), args.hours,
+                               speeds, directions, None if moistures[0] is None else moistures, args.steps)
+    np.savez_compressed(args.output, burned=masks, windSpeed=speeds, windDirection=directions,
+                        fuelMoisture=np.array(moistures, dtype=np.float64))
+    print(f"WildfireSim: wrote {len(scenarios)} scenarios to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+''' tests of the ensemble coordinator's recovery from lost and hung workers, on localhost
+
+    usage: python3 -m pytest test_ensemble.py
+'''
+import os, time, unittest
+from multiprocessing import Process
+from multiprocessing.connection import Client
+import numpy as np
+import ensemble, harness # local modules
+
+IGNITIONS = [(0.3, 0.3, 30), (0.7, 0.6, 30)]
+FORECAST = harness.constantForecast(3, 5.0, 30.0)
+
+''' runs a worker whose units never finish, standing in for a worker that dies mid unit '''
+def runHangingWorker(address, authkey):
+    ensemble.runUnit = lambda *args: time.sleep(60)
+    ensemble.runWorker(address, authkey)
+
+''' waits up to timeout seconds for condition() to hold '''
+def waitFor(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.05)
+
+class CoordinatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.elevationData = harness.slopeDEM(60)
+        cls.members = ensemble.perturbForecast(FORECAST, 2)
+        cls.expected = ensemble.runLocal(cls.elevationData, 10, 10, IGNITIONS, cls.members, workers=2)
+
+    def test_killed_worker_and_expired_lease(self):
+        authkey = os.urandom(16)
+        coordinator = ensemble.Coordinator(self.elevationData, 10, 10, IGNITIONS, self.members, leaseTimeout=1)
+        address = coordinator.start(("127.0.0.1", 0), authkey)
+
+        # a worker that is killed while holding a unit
+        killed = Process(target=runHangingWorker, args=(address, authkey))
+        killed.start()
+        waitFor(lambda: len(coordinator.leases) == 1)
+        killedUnit = next(iter(coordinator.leases))
+        killed.kill()
+        killed.join()
+        waitFor(lambda: killedUnit not in coordinator.leases)
+
+        # a worker that stays connected but never answers, so its lease has to expire
+        hung = Client(address, authkey=authkey)
+        hung.recv()
+        hung.send(("request",))
+        _, hungUnit, _ = hung.recv()
+
+        workers = [Process(target=ensemble.runWorker, args=(address, authkey)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        results = coordinator.wait()
+        for worker in workers:
+            worker.join()
+        hung.close()
+
+        self.assertEqual(results["completedUnits"], len(coordinator.units))
+        self.assertEqual(results["failedUnits"], [])
+        self.assertGreaterEqual(coordinator.attempts[killedUnit], 2)
+        self.assertGreaterEqual(coordinator.attempts[hungUnit], 2)
+        np.testing.assert_array_equal(results["burnCount"], self.expected["burnCount"])
+        np.testing.assert_array_equal(results["firstArrivalHour"], self.expected["firstArrivalHour"])
+
+    def test_late_error_keeps_new_lease(self):
+        coordinator = ensemble.Coordinator(self.elevationData, 10, 10, IGNITIONS[:1], self.members[:1],
+                                           leaseTimeout=0)
+        unitId = coordinator.nextUnit(1)
+        time.sleep(0.01)
+        self.assertEqual(coordinator.nextUnit(2), unitId) # connection 1's lease expired
+        coordinator.unitFailed(unitId, 1)
+        self.assertEqual(coordinator.leases[unitId][0], 2)
+        self.assertNotIn(unitId, coordinator.pending)
+
+    def test_completed_unit_is_not_requeued(self):
+        coordinator = ensemble.Coordinator(self.elevationData, 10, 10, IGNITIONS, self.members)
+        unitId = coordinator.nextUnit(1)
+        coordinator.addResult(unitId, ensemble.runUnit("automaton", self.elevationData, 10, 10,
+                                                       coordinator.units[unitId]))
+        with coordinator.condition:
+            coordinator.requeue(unitId)
+        self.assertNotIn(unitId, coordinator.pending)
+        self.assertNotIn(unitId, coordinator.failed)
+
+if __name__ == '__main__':
+    unittest.main()
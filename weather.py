@@ -1,4 +1,3 @@
-import requests
 import datetime
 import json
 import numpy as np
@@ -43,6 +42,7 @@ def getWeatherData(apikey, latitude, longitude):
                               f"longitude must be between -180 and 180 inclusive;" + \
                               f"given (lat, lon): {latitude}, {longitude}\n")
 
+    import requests # only loaded once a forecast is actually fetched
     weatherURL = "https://api.tomorrow.io/v4/timelines"
 
     querystring = {